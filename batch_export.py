@@ -0,0 +1,174 @@
+"""
+Headless batch export of borehole logs (no Tk root needed):
+
+export_hole (func)  - Render one borehole to PNG pages or a multi-page PDF.
+export_all (func)   - Export many boreholes in parallel, resumably.
+
+Usage:
+    python batch_export.py --db ./sqlite/example2.db --out export \\
+        --format pdf --jobs 4 [HOLE_ID ...]
+
+Completed holes are recorded in <out>/manifest.json with their timings;
+re-running the same command skips them, so an interrupted run resumes
+and failed holes are retried.
+"""
+
+from __future__ import print_function, division
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from instrument import timed
+from logplotter_sql import dbConnect
+from panels import LogFigure, data_columns, log_panels
+
+PAGE_SIZE = 100
+MANIFEST = 'manifest.json'
+
+
+def hole_pages(data):
+
+    """Return number of pages of a hole, as Model.pagemax"""
+
+    return int(1 + (data['tbl_elev']['chainage'].max() // PAGE_SIZE))
+
+
+@timed('export.hole')
+def export_hole(dbpath, bh, outdir, fmt='png', dpi=100):
+
+    """Export borehole bh, return (bh, {'files', 'pages', timings})"""
+
+    timings = {}
+    host = LogFigure(figsize=(7, 4), canvas_class=FigureCanvasAgg)
+    panels = log_panels(None, host=host)
+    host.layout()
+    host.check_columns()
+
+    # read only what the panels plot
+    t0 = time.time()
+    db = dbConnect(dbpath)
+    data = dict((t, db.fetch_table(t, bh, columns=cols))
+                for t, cols in data_columns(panels).items())
+    pagemax = hole_pages(data)
+    timings['fetch'] = time.time() - t0
+
+    # plot all panels into one headless figure
+    t0 = time.time()
+    host.plot(data)
+    timings['plot'] = time.time() - t0
+
+    # render 100 m pages
+    t0 = time.time()
+    name = bh.replace(os.sep, '_')
+    ax = panels[0].ax_log
+    files = []
+    if fmt == 'pdf':
+        files.append(os.path.join(outdir, '{}.pdf'.format(name)))
+        host.save_pdf(files[0], pagemax, PAGE_SIZE)
+    else:
+        for pg in range(1, pagemax+1):
+            ax.set_ylim(pg*PAGE_SIZE, (pg-1)*PAGE_SIZE)
+            files.append(os.path.join(outdir, '{}_{:03d}.{}'.format(
+                name, pg, fmt)))
+            host.fig.savefig(files[-1], dpi=dpi)
+    timings['render'] = time.time() - t0
+
+    return bh, {'files': files, 'pages': pagemax, 'seconds': timings}
+
+
+def load_manifest(outdir):
+
+    """Return {bh: record} of completed holes whose files still exist"""
+
+    path = os.path.join(outdir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        done = json.load(f)
+    return dict((bh, rec) for bh, rec in done.items()
+                if all(os.path.exists(fn) for fn in rec['files']))
+
+
+def save_manifest(outdir, done):
+
+    """Write manifest atomically"""
+
+    path = os.path.join(outdir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(done, f, indent=1, sort_keys=True)
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(path + '.tmp', path)
+
+
+def export_all(dbpath, outdir, holes=None, fmt='png', dpi=100, jobs=None):
+
+    """Export holes (default: all) over a process pool, skip finished ones
+
+    A hole whose export fails is reported and skipped; returns {bh:
+    exception} of those.
+    """
+
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    db = dbConnect(dbpath)
+    with db as cur:
+        # (also creates any missing indexes once, before the workers start)
+        allholes = [bh for bh, in cur.execute(dbConnect.qry_bhs)]
+    # (forked workers must open their own connections)
+    db.close()
+    holes = allholes if not holes else [bh for bh in holes if bh in allholes]
+    done = load_manifest(outdir)
+    todo = [bh for bh in holes if bh not in done]
+    print('{} holes, {} done, {} to export'.format(
+        len(holes), len(holes) - len(todo), len(todo)))
+
+    t0 = time.time()
+    failed = {}
+    pool = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        futures = dict((pool.submit(export_hole, dbpath, bh, outdir, fmt,
+                                    dpi), bh) for bh in todo)
+        for future in as_completed(futures):
+            try:
+                bh, rec = future.result()
+            except Exception as exc:
+                # (left out of the manifest, so a re-run retries it)
+                failed[futures[future]] = exc
+                print('{}: failed: {!r}'.format(futures[future], exc))
+                continue
+            done[bh] = rec
+            save_manifest(outdir, done)
+            sec = rec['seconds']
+            print('{}: {} pages, fetch {:.2f} s, plot {:.2f} s, '
+                  'render {:.2f} s'.format(bh, rec['pages'], sec['fetch'],
+                                           sec['plot'], sec['render']))
+    finally:
+        pool.shutdown(wait=False)
+    print('exported {} holes in {:.1f} s, {} failed'.format(
+        len(todo) - len(failed), time.time()-t0, len(failed)))
+    return failed
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Batch export of logs')
+    parser.add_argument('holes', nargs='*', help='hole ids (default: all)')
+    parser.add_argument('--db', default='./sqlite/example2.db')
+    parser.add_argument('--out', default='export')
+    parser.add_argument('--format', choices=['png', 'pdf'], default='png')
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    failed = export_all(args.db, args.out, args.holes, args.format, args.dpi,
+                        args.jobs)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,224 @@
+"""
+Headless benchmarks of loading, plotting, paging and export:
+
+run_suite (func)    - Time the viewer's hot paths on a db, return results.
+compare (func)      - Compare two result files, report regressions.
+
+Usage:
+    python benchmark.py run --generate --out before.json
+    python benchmark.py run --db ./sqlite/example2.db --out after.json
+    python benchmark.py compare before.json after.json
+
+Results are JSON: {'meta': {...}, 'results': {name: timing}}, where each
+timing holds min, median and mean seconds over the repeats. compare exits
+with status 1 if any median got slower by more than the threshold.
+"""
+
+from __future__ import print_function, division
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import numpy as np
+
+import Tkinter as tk
+
+from logplotter_sql import dbConnect
+from cache import ColumnStore
+from panels import LogFigure, data_columns, log_panels
+from batch_export import export_hole
+from logplotter_app import Model, ViewPage
+from synthetic_db import make_db
+
+# app window size (inches at 100 dpi), as root.geometry
+FIGSIZE = (5., 6.5)
+
+
+def timing(func, repeat=5):
+
+    """Return {'min', 'median', 'mean', 'runs'} seconds of func()"""
+
+    times = []
+    for _ in range(repeat):
+        t0 = time.time()
+        func()
+        times.append(time.time() - t0)
+    return {'min': min(times), 'median': float(np.median(times)),
+            'mean': float(np.mean(times)), 'runs': repeat}
+
+
+def bench_fetch(dbpath, bh, spec, results, repeat):
+
+    """Time Model.db_fetch of spec from sqlite and from the column store"""
+
+    # (Tcl without a window holds the model's Tk variables)
+    model = Model(tk.Tcl())
+    model.dbpath = dbpath
+    model.spec = spec
+    results['db_fetch.sqlite'] = timing(lambda: model.db_fetch(bh), repeat)
+
+    root = tempfile.mkdtemp()
+    try:
+        model.store = ColumnStore(dbpath, root)
+        model.store.rebuild(bh, model.fetch_columns())
+        results['db_fetch.store'] = timing(lambda: model.db_fetch(bh),
+                                           repeat)
+    finally:
+        shutil.rmtree(root)
+    return model.data, model.pagemax
+
+
+def shared_figure():
+
+    """Return headless LogFigure of all panels, as the app's"""
+
+    host = LogFigure(width_ratios=ViewPage.width_ratios, figsize=FIGSIZE,
+                     canvas_class=FigureCanvasAgg)
+    log_panels(None, host=host)
+    host.layout()
+    # (per-panel timings mean nothing if columns share axes)
+    host.check_columns()
+    return host
+
+
+def bench_panels(host, data, results, repeat):
+
+    """Time plot and draw of each panel"""
+
+    host.plot(data)
+    host.set_depthlims(0, 100)
+    host.canvas.draw()
+    renderer = host.canvas.get_renderer()
+    for i, panel in enumerate(host.panels):
+        name = '{}.{}'.format(i, type(panel).__name__)
+        tables = [data[t] for t in panel.tables]
+        results['plot.' + name] = timing(lambda: panel.plot(*tables), repeat)
+        results['draw.' + name] = timing(
+            lambda: [ax.draw(renderer) for ax in panel.axes], repeat)
+
+
+def bench_paging(host, pagemax, results, repeat):
+
+    """Time paging through a hole, full redraw per page"""
+
+    def page_through():
+        for pg in range(1, pagemax + 1):
+            host.set_depthlims((pg - 1) * 100, pg * 100)
+            host.canvas.draw()
+
+    t = timing(page_through, repeat)
+    results['paging.hole'] = t
+    results['paging.page'] = dict(
+        (k, v / pagemax if k != 'runs' else v) for k, v in t.items())
+
+
+def bench_export(dbpath, bh, results, repeat):
+
+    """Time headless export of a hole, PNG pages and PDF"""
+
+    outdir = tempfile.mkdtemp()
+    try:
+        for fmt in ('png', 'pdf'):
+            results['export.' + fmt] = timing(
+                lambda: export_hole(dbpath, bh, outdir, fmt), repeat)
+    finally:
+        shutil.rmtree(outdir)
+
+
+def run_suite(dbpath, bh=None, repeat=5):
+
+    """Run all benchmarks on hole bh (default: first) of db"""
+
+    with dbConnect(dbpath) as cur:
+        # (also creates any missing indexes, outside the timings)
+        holes = [h for h, in cur.execute(dbConnect.qry_bhs)]
+    bh = bh or holes[0]
+    results = {}
+    host = shared_figure()
+    spec = data_columns(host.panels)
+    data, pagemax = bench_fetch(dbpath, bh, spec, results, repeat)
+    bench_panels(host, data, results, repeat)
+    bench_paging(host, pagemax, results, repeat)
+    bench_export(dbpath, bh, results, max(1, repeat // 2))
+
+    meta = {'db': os.path.abspath(dbpath),
+            'db_bytes': os.path.getsize(dbpath), 'hole': bh,
+            'pages': pagemax, 'repeat': repeat,
+            'rows': dict((t, len(df)) for t, df in data.items()),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'matplotlib': matplotlib.__version__}
+    return {'meta': meta, 'results': results}
+
+
+def compare(old, new, threshold=.1):
+
+    """Print median change per benchmark, return names of regressions"""
+
+    regressions = []
+    print('{:32} {:>10} {:>10} {:>8}'.format('benchmark', 'old (ms)',
+                                             'new (ms)', 'change'))
+    for name in sorted(set(old['results']) & set(new['results'])):
+        a = old['results'][name]['median']
+        b = new['results'][name]['median']
+        change = (b - a) / a if a else 0.
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('{:32} {:10.2f} {:10.2f} {:+7.0%}{}'.format(
+            name, a * 1e3, b * 1e3, change, flag))
+    return regressions
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Log viewer benchmarks')
+    sub = parser.add_subparsers(dest='command')
+    run = sub.add_parser('run', help='run benchmarks, write JSON results')
+    run.add_argument('--db', default='bench.db')
+    run.add_argument('--hole', default=None, help='default: first hole')
+    run.add_argument('--repeat', type=int, default=5)
+    run.add_argument('--out', default='benchmark.json')
+    run.add_argument('--generate', action='store_true',
+                     help='(re)write --db as a synthetic db first')
+    run.add_argument('--holes', type=int, default=3)
+    run.add_argument('--depth', type=float, default=1000.)
+    run.add_argument('--density', type=float, default=10.)
+    run.add_argument('--seed', type=int, default=0)
+    cmp_ = sub.add_parser('compare', help='compare two result files')
+    cmp_.add_argument('old')
+    cmp_.add_argument('new')
+    cmp_.add_argument('--threshold', type=float, default=.1,
+                      help='relative slow-down counted as regression')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        sys.exit(1 if compare(old, new, args.threshold) else 0)
+
+    if args.generate:
+        make_db(args.db, args.holes, args.depth, args.density,
+                seed=args.seed)
+    out = run_suite(args.db, args.hole, args.repeat)
+    if args.generate:
+        out['meta']['generator'] = {'holes': args.holes, 'depth': args.depth,
+                                    'density': args.density,
+                                    'seed': args.seed}
+    with open(args.out, 'w') as f:
+        json.dump(out, f, indent=1, sort_keys=True)
+    for name, t in sorted(out['results'].items()):
+        print('{:32} {:10.2f} ms'.format(name, t['median'] * 1e3))
@@ -0,0 +1,311 @@
+"""
+Caching classes:
+
+MemoryLRU (class)      - Least-recently-used cache bounded by a byte budget.
+BoreholeCache (class)  - MemoryLRU of per-borehole LogTables.
+ColumnStore (class)    - On-disk cache of borehole tables as NumPy columns.
+frames_nbytes (func)   - Memory footprint of a dict of LogTables.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from instrument import timed
+from logplotter_sql import dbConnect
+
+
+def _digest(text):
+
+    """Return short hex digest of text, for use as a file name"""
+
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def frames_nbytes(data):
+
+    """Return memory usage (bytes) of a dict of LogTables"""
+
+    return sum(t.nbytes for t in data.values())
+
+
+class MemoryLRU(object):
+
+    """LRU cache that evicts by total size rather than entry count"""
+
+    def __init__(self, budget, sizeof):
+
+        """Initialise with byte budget and size function for values"""
+
+        self.budget = budget
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._sizes = {}
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+
+        """Return cached value, marking it most recently used"""
+
+        try:
+            value = self._items.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._items[key] = value
+        self.hits += 1
+        return value
+
+    def peek(self, key, default=None):
+
+        """Return cached value without touching LRU order or counters"""
+
+        return self._items.get(key, default)
+
+    def put(self, key, value):
+
+        """Add value to cache, evicting old entries to fit the budget"""
+
+        self.discard(key)
+        size = self.sizeof(value)
+        self._items[key] = value
+        self._sizes[key] = size
+        self.nbytes += size
+        self._evict()
+
+    def discard(self, key):
+
+        """Remove key from cache (no-op if absent)"""
+
+        if key in self._items:
+            del self._items[key]
+            self.nbytes -= self._sizes.pop(key)
+
+    def clear(self):
+
+        """Remove all entries (counters are kept)"""
+
+        self._items.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+
+    def stats(self):
+
+        """Return dict of cache counters"""
+
+        return {'entries': len(self._items), 'nbytes': self.nbytes,
+                'budget': self.budget, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
+
+    def _evict(self):
+
+        """Drop least-recently-used entries until within budget"""
+
+        # always keep the newest entry, even if it exceeds the budget
+        while self.nbytes > self.budget and len(self._items) > 1:
+            self.discard(next(iter(self._items)))
+            self.evictions += 1
+
+
+class BoreholeCache(MemoryLRU):
+
+    """Per-borehole cache of {table name: LogTable} dicts"""
+
+    def __init__(self, budget=256 * 2**20):
+
+        """Initialise, default budget 256 MiB"""
+
+        super(BoreholeCache, self).__init__(budget, frames_nbytes)
+
+
+class ColumnStore(object):
+
+    """Persistent cache of borehole tables as one .npy file per column
+
+    Columns are stored as typed LogTable arrays (categorical columns as
+    codes, their categories in tables.json) and reopened memory-mapped,
+    so a cached hole is read without SQLite or per-row tuples. Entries
+    live under a key made of the store format, the db path, its mtime
+    and size and its schema, so any change to the db starts a fresh,
+    empty store.
+    """
+
+    # bump when the stored layout changes
+    version = 3
+
+    def __init__(self, dbpath, root):
+
+        """Initialise for db at dbpath, storing under directory root"""
+
+        self.dbpath = dbpath
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+        dbdir = _digest(os.path.abspath(dbpath))
+        self.key = self.db_key()
+        self.path = os.path.join(root, dbdir, self.key)
+
+    def db_key(self):
+
+        """Return hex key of db path, mtime, size and schema"""
+
+        path = os.path.abspath(self.dbpath)
+        stat = os.stat(path)
+        db = dbConnect(self.dbpath)
+        schema = [(t, db.columns(t)) for t in sorted(db.tables())]
+        return _digest(json.dumps([self.version, path, stat.st_mtime,
+                                   stat.st_size, schema]))
+
+    def hole_path(self, bh):
+
+        """Return directory of borehole bh"""
+
+        return os.path.join(self.path, _digest(bh))
+
+    def __contains__(self, bh):
+        return os.path.isdir(self.hole_path(bh))
+
+    def stored_columns(self, bh):
+
+        """Return {table: [(column, dtype, categories)]} stored for bh
+
+        categories is None for non-categorical columns. Returns None if
+        bh is not stored.
+        """
+
+        try:
+            with open(os.path.join(self.hole_path(bh), 'tables.json')) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def covers(self, bh, columns=None, stored=None):
+
+        """Return True if bh is stored with {table: [columns]}
+
+        A table's columns may be None (any stored columns will do).
+        """
+
+        if stored is None:
+            stored = self.stored_columns(bh)
+        if stored is None:
+            return False
+        for table, cols in (columns or {}).items():
+            if table not in stored:
+                return False
+            names = set(c[0] for c in stored[table])
+            if cols is not None and not names.issuperset(cols):
+                return False
+        return True
+
+    @timed('store.load')
+    def load(self, bh, columns=None):
+
+        """Return {table: LogTable} of bh, or None if not stored
+
+        If columns ({table: [columns]}) is given, bh must have been stored
+        with at least those.
+        """
+
+        import numpy as np
+        from logtable import LogTable
+
+        path = self.hole_path(bh)
+        tables = self.stored_columns(bh)
+        if not self.covers(bh, columns, tables):
+            self.misses += 1
+            return None
+        data = {}
+        for table, columns in tables.items():
+            arrays = OrderedDict()
+            categories = {}
+            for i, (col, _, cats) in enumerate(columns):
+                fn = os.path.join(path, '{}.{}.npy'.format(table, i))
+                arrays[col] = np.load(fn, mmap_mode='r')
+                if cats is not None:
+                    categories[col] = cats
+            data[table] = LogTable(arrays, categories)
+        self.hits += 1
+        return data
+
+    @timed('store.save')
+    def save(self, bh, data):
+
+        """Store {table: LogTable} of bh, replacing it (any thread)"""
+
+        import numpy as np
+
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                # (made by another thread)
+                pass
+
+        # write to a private directory, then move it into place
+        tmp = tempfile.mkdtemp(dir=self.path)
+        tables = {}
+        for table, t in data.items():
+            tables[table] = []
+            for i, col in enumerate(t.columns):
+                values = t.array(col)
+                tables[table].append((col, values.dtype.str,
+                                      t.categories(col)))
+                np.save(os.path.join(tmp, '{}.{}.npy'.format(table, i)),
+                        values, allow_pickle=False)
+        with open(os.path.join(tmp, 'tables.json'), 'w') as f:
+            json.dump(tables, f)
+        target = self.hole_path(bh)
+        old = None
+        if os.path.isdir(target):
+            old = tmp + '.old'
+            try:
+                os.rename(target, old)
+            except OSError:
+                old = None
+        try:
+            os.rename(tmp, target)
+        except OSError:
+            # stored by another thread in the meantime
+            shutil.rmtree(tmp, ignore_errors=True)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def rebuild(self, bh, columns=None):
+
+        """Read bh from the db and store it, return its data
+
+        columns ({table: [columns] or None}) restricts what is read;
+        by default all columns of all tables.
+        """
+
+        db = dbConnect(self.dbpath)
+        if columns is None:
+            columns = dict((t, None) for t in db.hole_tables())
+        data = dict((t, db.fetch_table(t, bh, columns=cols))
+                    for t, cols in columns.items())
+        self.save(bh, data)
+        return data
+
+    def prune(self):
+
+        """Remove entries stored for older versions of the db"""
+
+        dbdir = os.path.dirname(self.path)
+        if not os.path.isdir(dbdir):
+            return
+        for name in os.listdir(dbdir):
+            if name != self.key:
+                shutil.rmtree(os.path.join(dbdir, name), ignore_errors=True)
@@ -0,0 +1,130 @@
+"""
+Depth cursor:
+
+DepthCursor (class) - Horizontal depth line across log panels, drawn by
+                      blitting over a cached background.
+"""
+
+
+class DepthCursor(object):
+
+    """Correlated depth cursor across the log axes of several panels
+
+    The static figure is cached after every full draw; motion only
+    restores that background and redraws the (animated) cursor lines.
+    Motion is coalesced so at most one update happens per frame.
+
+    Each background is kept with the depth limits it was rendered at
+    (depthlims), and is not blitted once the limits have changed, i.e.
+    while a render is pending, or while held (the canvas shows a
+    preview, see DepthNavigator).
+    """
+
+    def __init__(self, widget, panels, callback=None, interval=16):
+
+        """Initialise with Tk widget for after(), list of log panels"""
+
+        self.widget = widget
+        self.callback = callback
+        self.interval = interval
+        self.depth = None
+        self.log_axes = set()
+        self.lines = {}
+        self.backgrounds = {}
+        self.depthlims = {}
+        self.paused = False
+        self.held = False
+        self._scheduled = False
+
+        self.add_panels(panels)
+
+    def add_panels(self, panels):
+
+        """Add log panels, e.g. built after the cursor"""
+
+        # one animated line per panel, grouped by canvas
+        new = []
+        for panel in panels:
+            canvas = panel if panel.host is None else panel.host.canvas
+            line = panel.ax_log.axhline(0, color='k', lw=.8, animated=True,
+                                        visible=False)
+            if canvas not in self.lines:
+                new.append(canvas)
+            self.lines.setdefault(canvas, []).append(line)
+            self.log_axes.update(panel.axes[1:])
+        for canvas in new:
+            canvas.mpl_connect('draw_event', self.on_draw)
+            canvas.mpl_connect('motion_notify_event', self.on_move)
+            canvas.mpl_connect('figure_leave_event', self.on_leave)
+
+    def on_draw(self, event):
+
+        """Cache background after a full draw, then redraw the cursor"""
+
+        # (ignore off-screen renders)
+        if self.paused:
+            return
+        canvas = event.canvas
+        self.set_background(canvas, canvas.copy_from_bbox(canvas.figure.bbox))
+
+    def set_background(self, canvas, background):
+
+        """Set cached background of canvas, and draw the cursor over it"""
+
+        self.backgrounds[canvas] = background
+        self.depthlims[canvas] = self.lines[canvas][0].axes.get_ylim()
+        if self.depth is not None:
+            self._blit(canvas)
+
+    def on_move(self, event):
+
+        """Track mouse over log axes"""
+
+        if event.inaxes in self.log_axes:
+            self.move(event.ydata)
+        else:
+            self.move(None)
+
+    def on_leave(self, event):
+
+        """Hide cursor when mouse leaves a figure"""
+
+        self.move(None)
+
+    def move(self, depth):
+
+        """Move cursor to depth (None hides it) at the next frame"""
+
+        self.depth = depth
+        if not self._scheduled:
+            self._scheduled = True
+            self.widget.after(self.interval, self._update)
+
+    def _update(self):
+
+        """Blit cursor on all canvases, report depth"""
+
+        self._scheduled = False
+        for canvas in self.lines:
+            self._blit(canvas)
+        if self.callback is not None:
+            self.callback(self.depth)
+
+    def _blit(self, canvas):
+
+        """Restore background of canvas and draw its cursor lines"""
+
+        background = self.backgrounds.get(canvas)
+        if (self.held or background is None or
+                not canvas.get_tk_widget().winfo_ismapped() or
+                self.depthlims[canvas] !=
+                self.lines[canvas][0].axes.get_ylim()):
+            return
+        canvas.restore_region(background)
+        for line in self.lines[canvas]:
+            shown = self.depth is not None and line.axes.get_visible()
+            line.set_visible(shown)
+            if shown:
+                line.set_ydata([self.depth, self.depth])
+                line.axes.draw_artist(line)
+        canvas.blit(canvas.figure.bbox)
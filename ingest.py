@@ -0,0 +1,312 @@
+"""
+Bulk loading of log files into the borehole database:
+
+ingest (func)       - Load CSV/LAS files, resumably, then build indexes.
+ingest_file (func)  - Stream one file into its tbl_* table.
+read_csv (func)     - Column names and rows of a CSV file.
+read_las (func)     - Curve names, rows and well of a LAS 2.0 file.
+
+Usage:
+    python ingest.py --db ./sqlite/example2.db --table tbl_mods a.csv b.csv
+    python ingest.py --db new.db --hole KFM01A logs/tbl_pspr_KFM01A.las
+
+A file's table is --table or the tbl_* name its file name starts with;
+its hole is the hole_id column, else --hole, else the LAS WELL. Missing
+tables are created as in synthetic_db.SCHEMA.
+
+Rows are inserted with executemany in batches of one transaction each,
+in WAL mode with synchronous off. Each batch commits together with the
+file's progress in the ingest_files table, so an interrupted run resumes
+after the last committed batch, and loaded files are skipped. The
+(hole_id, depth) indexes are dropped before and rebuilt after loading,
+and the summary tables (see summary) of tables with new rows are
+rewritten.
+"""
+
+from __future__ import print_function, division
+import argparse
+import csv
+import os
+import sqlite3
+import time
+from itertools import islice
+
+from logplotter_sql import dbConnect, DEPTH_COLUMNS
+from summary import SUMMARY_COLUMNS, build_summaries
+from synthetic_db import SCHEMA, TYPES
+
+# LAS curve mnemonics of measured depth
+LAS_DEPTH = ('DEPT', 'DEPTH', 'MD')
+
+qry_progress = ('CREATE TABLE IF NOT EXISTS ingest_files (path TEXT PRIMARY '
+                'KEY, size INTEGER, mtime REAL, rows INTEGER, done INTEGER);')
+# tables with rows added since their summaries were built
+qry_stale = ('CREATE TABLE IF NOT EXISTS ingest_summaries (name TEXT PRIMARY '
+             'KEY);')
+
+
+def read_csv(f):
+
+    """Return (column names, row iterator, {}) of CSV file object f"""
+
+    reader = csv.reader(f)
+    names = [n.strip() for n in next(reader)]
+    return names, reader, {}
+
+
+def read_las(f):
+
+    """Return (curve names, row iterator, {'hole_id': WELL}) of LAS file f
+
+    Values equal to the NULL value of the well section are None. Wrapped
+    files (WRAP YES) are not supported.
+    """
+
+    section = None
+    names = []
+    meta = {}
+    null = None
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('~'):
+            section = line[1:2].upper()
+            if section == 'A':
+                break
+            continue
+        if section not in ('V', 'W', 'C'):
+            continue
+        # MNEM.UNIT  VALUE : DESCRIPTION
+        mnem, _, rest = line.partition('.')
+        if ':' in rest:
+            rest = rest.rpartition(':')[0]
+        # (the unit follows the dot directly, up to the first space)
+        value = rest.partition(' ')[2].strip()
+        mnem = mnem.strip().upper()
+        if section == 'V' and mnem == 'WRAP' and value.upper() == 'YES':
+            raise ValueError('Wrapped LAS files are not supported')
+        elif section == 'W' and mnem == 'NULL':
+            null = float(value)
+        elif section == 'W' and mnem == 'WELL' and value:
+            meta['hole_id'] = value
+        elif section == 'C':
+            names.append(mnem)
+
+    def rows():
+        for line in f:
+            values = [float(v) for v in line.split()]
+            if values:
+                yield [None if v == null else v for v in values]
+    return names, rows(), meta
+
+
+def table_for(path, table=None):
+
+    """Return table of file path: table, or the tbl_* name it starts with"""
+
+    if table is not None:
+        return table
+    name = os.path.basename(path).lower()
+    for t, _ in sorted(SCHEMA, key=lambda s: -len(s[0])):
+        if name.startswith(t):
+            return t
+    raise ValueError('No table for {!r}: name it tbl_*, or use '
+                     '--table'.format(path))
+
+
+def create_tables(conn):
+
+    """Create missing tables of SCHEMA, and the progress tables"""
+
+    for table, cols in SCHEMA:
+        defs = ['hole_id TEXT'] + ['"{}" {}'.format(c, TYPES.get(c, 'REAL'))
+                                   for c in cols]
+        conn.execute('CREATE TABLE IF NOT EXISTS "{}" ({});'.format(
+            table, ', '.join(defs)))
+    conn.execute(qry_progress)
+    conn.execute(qry_stale)
+
+
+def column_map(names, columns, las=False):
+
+    """Return [(input position, table column)] of input names
+
+    Names match columns case-insensitively; LAS depth curves match the
+    table's depth column, other unknown LAS curves are skipped. Unknown
+    CSV columns raise ValueError.
+    """
+
+    lower = dict((c.lower(), c) for c in columns)
+    depth = [c for c in DEPTH_COLUMNS if c in columns][:1]
+    mapping = []
+    for i, name in enumerate(names):
+        if las and name in LAS_DEPTH and depth:
+            mapping.append((i, depth[0]))
+        elif name.lower() in lower:
+            mapping.append((i, lower[name.lower()]))
+        elif not las:
+            raise ValueError('Unknown column: {!r}'.format(name))
+    return mapping
+
+
+def progress(conn, path):
+
+    """Return (rows, done) recorded for file path, (0, False) if new
+
+    Raises ValueError if the file changed since it was (partly) loaded.
+    """
+
+    stat = os.stat(path)
+    row = conn.execute('SELECT size, mtime, rows, done FROM ingest_files '
+                       'WHERE path=?;', (path,)).fetchone()
+    if row is None:
+        with conn:
+            conn.execute('INSERT INTO ingest_files VALUES (?, ?, ?, 0, 0);',
+                         (path, stat.st_size, stat.st_mtime))
+        return 0, False
+    if (row[0], row[1]) != (stat.st_size, stat.st_mtime):
+        raise ValueError('{!r} changed since it was loaded'.format(path))
+    return row[2], bool(row[3])
+
+
+def ingest_file(conn, path, table=None, hole=None, batch=50000):
+
+    """Load file path into its table, return number of rows added
+
+    Resumes after the rows of an interrupted load; a loaded file adds
+    nothing.
+    """
+
+    path = os.path.abspath(path)
+    table = table_for(path, table)
+    done_rows, done = progress(conn, path)
+    if done:
+        return 0
+
+    las = path.lower().endswith('.las')
+    with open(path) as f:
+        names, rows, meta = (read_las if las else read_csv)(f)
+        columns = [r[1] for r in conn.execute(
+            'PRAGMA table_info("{}");'.format(table))]
+        mapping = column_map(names, columns, las)
+        targets = [c for _, c in mapping]
+        index = [i for i, _ in mapping]
+
+        # hole id from the data, else given, else from the LAS header
+        if 'hole_id' in targets:
+            hole = None
+        else:
+            hole = hole or meta.get('hole_id')
+            if hole is None:
+                raise ValueError('No hole id for {!r}: use --hole'.format(
+                    path))
+            targets.insert(0, 'hole_id')
+        sql = 'INSERT INTO "{}" ({}) VALUES ({});'.format(
+            table, ', '.join('"{}"'.format(c) for c in targets),
+            ', '.join('?' * len(targets)))
+
+        # (text '' is NULL; sqlite converts numbers by column affinity)
+        def convert(row):
+            values = [None if row[i] == '' else row[i] for i in index]
+            return values if hole is None else [hole] + values
+
+        n = done_rows
+        rows = islice(rows, done_rows, None)
+        while True:
+            chunk = [convert(r) for r in islice(rows, batch)]
+            if not chunk:
+                break
+            with conn:
+                conn.executemany(sql, chunk)
+                n += len(chunk)
+                conn.execute('UPDATE ingest_files SET rows=? WHERE path=?;',
+                             (n, path))
+                if table in SUMMARY_COLUMNS:
+                    conn.execute('INSERT OR IGNORE INTO ingest_summaries '
+                                 'VALUES (?);', (table,))
+    with conn:
+        conn.execute('UPDATE ingest_files SET done=1 WHERE path=?;', (path,))
+    return n - done_rows
+
+
+def ingest(dbpath, paths, table=None, hole=None, batch=50000):
+
+    """Load files into db, print rows/s, return total rows added"""
+
+    conn = sqlite3.connect(dbpath)
+    tables = set()
+    total = 0
+    t0 = time.time()
+    try:
+        conn.execute('PRAGMA journal_mode=WAL;')
+        conn.execute('PRAGMA synchronous=OFF;')
+        conn.execute('PRAGMA cache_size=-{:d};'.format(256 * 2**10))
+        create_tables(conn)
+
+        # indexes are built after loading, all at once
+        todo = [p for p in paths if not progress(conn, os.path.abspath(p))[1]]
+        with conn:
+            for t in set(table_for(p, table) for p in todo):
+                conn.execute('DROP INDEX IF EXISTS "idx_{}_hole_id";'.format(
+                    t))
+
+        for path in paths:
+            t1 = time.time()
+            n = ingest_file(conn, path, table, hole, batch)
+            sec = time.time() - t1
+            total += n
+            tables.add(table_for(path, table))
+            if n:
+                print('{}: {} rows in {:.1f} s ({:.0f} rows/s)'.format(
+                    path, n, sec, n / max(sec, 1e-9)))
+            else:
+                print('{}: already loaded'.format(path))
+
+        # summaries of tables with new rows, also of earlier runs whose
+        # build was interrupted
+        stale = [t for t, in conn.execute('SELECT name FROM ingest_summaries '
+                                          'ORDER BY name;')]
+        if stale:
+            t1 = time.time()
+            for t in stale:
+                build_summaries(conn, [t])
+                with conn:
+                    conn.execute('DELETE FROM ingest_summaries WHERE name=?;',
+                                 (t,))
+            print('summaries of {} in {:.1f} s'.format(', '.join(stale),
+                                                      time.time() - t1))
+
+        # list new holes
+        with conn:
+            for t in sorted(tables - set(['tbl_duct'])):
+                conn.execute('INSERT INTO tbl_duct (hole_id) SELECT DISTINCT '
+                             'hole_id FROM "{}" WHERE hole_id NOT IN (SELECT '
+                             'hole_id FROM tbl_duct);'.format(t))
+        conn.execute('PRAGMA journal_mode=DELETE;')
+    finally:
+        conn.close()
+
+    # (the viewer opens the db read-only, so build its indexes here)
+    t1 = time.time()
+    dbConnect(dbpath).create_indexes()
+    sec = time.time() - t0
+    print('{} rows in {:.1f} s ({:.0f} rows/s), indexes {:.1f} s'.format(
+        total, sec, total / max(sec, 1e-9), time.time() - t1))
+    return total
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Load log files into db')
+    parser.add_argument('files', nargs='+', help='CSV or LAS (.las) files')
+    parser.add_argument('--db', default='./sqlite/example2.db')
+    parser.add_argument('--table', default=None,
+                        help='target table (default: from file name)')
+    parser.add_argument('--hole', default=None,
+                        help='hole id of files without a hole_id column')
+    parser.add_argument('--batch', type=int, default=50000,
+                        help='rows per transaction')
+    args = parser.parse_args()
+
+    ingest(args.db, args.files, args.table, args.hole, args.batch)
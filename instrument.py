@@ -0,0 +1,124 @@
+"""
+Timing instrumentation of hot paths:
+
+Histogram (class)   - Rolling histogram of recent run times.
+timed (func)        - Decorator recording the run time of a function.
+record (func)       - Record one run time.
+report (func)       - Summary lines of all recorded timings.
+
+Enabled by setting the environment variable LOGPLOTTER_PROFILE=1 before
+start-up; otherwise timed() returns functions unchanged, so the
+instrumentation costs nothing. Each run time is logged as a DEBUG record
+of the 'logplotter.timing' logger, with 'timing' (name) and 'ms' fields.
+"""
+
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+ENABLED = os.environ.get('LOGPLOTTER_PROFILE', '') not in ('', '0')
+
+# histogram bin edges, ms
+BINS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+log = logging.getLogger('logplotter.timing')
+histograms = {}
+_lock = threading.Lock()
+
+
+class Histogram(object):
+
+    """Run times of the last maxlen calls"""
+
+    def __init__(self, maxlen=500):
+
+        """Initialise empty"""
+
+        self.times = deque(maxlen=maxlen)
+
+    def add(self, ms):
+        self.times.append(ms)
+
+    def counts(self):
+
+        """Return counts per BINS interval (last one open-ended)"""
+
+        counts = [0] * (len(BINS) + 1)
+        for ms in self.times:
+            counts[bisect.bisect(BINS, ms)] += 1
+        return counts
+
+    def summary(self):
+
+        """Return dict of count, mean, median, p95 and max (ms)"""
+
+        times = sorted(self.times)
+        n = len(times)
+        if not n:
+            return {'count': 0}
+        return {'count': n, 'mean': sum(times) / n, 'median': times[n // 2],
+                'p95': times[min(n - 1, int(n * .95))], 'max': times[-1]}
+
+
+def record(name, seconds):
+
+    """Add run time to histogram of name, and log it"""
+
+    ms = seconds * 1e3
+    with _lock:
+        hist = histograms.get(name)
+        if hist is None:
+            hist = histograms[name] = Histogram()
+        hist.add(ms)
+    log.debug('%s %.2f ms', name, ms, extra={'timing': name, 'ms': ms})
+
+
+def timed(name, timings=None):
+
+    """Decorator: record run times of func under name, if enabled
+
+    name may refer to the call's arguments, e.g. 'plot.{0.__class__.__name__}'
+    for the class of self. The last run time (s) is also stored under the
+    first part of name in the dict timings, or in self.timings if the
+    first argument has such a dict.
+    """
+
+    def decorate(func):
+        if not ENABLED:
+            return func
+        key = name.split('.')[0]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = time.time() - t0
+                record(name.format(*args), seconds)
+                store = timings
+                if store is None and args:
+                    store = getattr(args[0], 'timings', None)
+                if isinstance(store, dict):
+                    store[key] = seconds
+        return wrapper
+    return decorate
+
+
+def report():
+
+    """Return list of summary lines, one per timing name"""
+
+    lines = []
+    with _lock:
+        items = sorted(histograms.items())
+    for name, hist in items:
+        s = hist.summary()
+        if s['count']:
+            lines.append('{}: n={count} mean={mean:.1f} median={median:.1f} '
+                         'p95={p95:.1f} max={max:.1f} ms'.format(name, **s))
+    return lines
@@ -0,0 +1,69 @@
+"""
+Level-of-detail decimation:
+
+MinMaxPyramid (class) - Min/max-per-bin pyramid of a curve sampled in depth.
+"""
+
+import numpy as np
+
+
+def _decimate(x, depth, group):
+
+    """Keep the min and max sample (in depth order) of each group"""
+
+    pad = -len(x) % group
+    if pad:
+        x = np.append(x, np.full(pad, np.nan))
+        depth = np.append(depth, np.full(pad, np.nan))
+    xs, ds = x.reshape(-1, group), depth.reshape(-1, group)
+    lo = np.where(np.isnan(xs), np.inf, xs).argmin(axis=1)
+    hi = np.where(np.isnan(xs), -np.inf, xs).argmax(axis=1)
+    idx = np.column_stack([np.minimum(lo, hi), np.maximum(lo, hi)])
+    rows = np.arange(len(xs))[:, np.newaxis]
+    return xs[rows, idx].ravel(), ds[rows, idx].ravel()
+
+
+class MinMaxPyramid(object):
+
+    """Decimation levels of a curve x(depth) that preserve peaks
+
+    Level 0 is the raw curve. Level k holds the minimum and maximum sample
+    of each bin of 2**(k+1) raw samples, so every level halves the number
+    of vertices but keeps the extremes a pixel row would show.
+    """
+
+    def __init__(self, x, depth, min_points=1024):
+
+        """Build levels down to about min_points vertices"""
+
+        x = np.asarray(x, dtype=float)
+        depth = np.asarray(depth, dtype=float)
+        if len(depth) and np.any(np.diff(depth) < 0):
+            order = np.argsort(depth, kind='mergesort')
+            x, depth = x[order], depth[order]
+        self.levels = [(x, depth)]
+        while len(x) > min_points:
+            # two min/max pairs (or four raw samples) -> one pair
+            x, depth = _decimate(x, depth, 4)
+            self.levels.append((x, depth))
+
+    @property
+    def x(self):
+        return self.levels[0][0]
+
+    def select(self, ymin, ymax, pixels):
+
+        """Return (x, depth) in [ymin, ymax] at about 2 vertices per pixel"""
+
+        raw = self.levels[0][1]
+        n = np.searchsorted(raw, ymax, 'right') - np.searchsorted(raw, ymin)
+        level = 0
+        while (level+1 < len(self.levels) and
+               n / 2.**(level+1) >= 2 * pixels):
+            level += 1
+
+        # slice to view, keeping one vertex either side
+        x, depth = self.levels[level]
+        i = max(np.searchsorted(depth, ymin) - 1, 0)
+        j = np.searchsorted(depth, ymax, 'right') + 1
+        return x[i:j], depth[i:j]
@@ -6,9 +6,7 @@ TODO:
  * Fix panel formatting
  * Use matplotlib's 'set_data' method to update graph?
  * Fix save_as_image, see https://tkinter.unpythonic.net/wiki/tkFileDialog
- * Use caching to store logs <-- USE A 'MEMOIZE' DECORATOR!
  * Add legend on second page (linked to figure properties, in new module)
- * Implement application-level logging (using logging)
 
 NOTES:
  * Structure: https://stackoverflow.com/questions/17466561/best-way-to-structure-a-tkinter-application
@@ -18,40 +16,54 @@ NOTES:
 """
 
 from __future__ import print_function, division
+import time
+_T0 = time.time()
+import argparse
 import json
+import logging
+import os
+import sys
 from functools import partial
 import Tkinter as tk
+import ttk
 from tkColorChooser import askcolor
 from tkFileDialog import asksaveasfilename
-import pandas as pd
-from PIL import Image
-
-import matplotlib
-matplotlib.use("TkAgg")
-from matplotlib import style
 
+# (numpy, PIL and matplotlib are imported where first used, so the
+# window can appear before they are loaded)
+import instrument
+from instrument import timed
 from logplotter_sql import dbConnect
-from panels import (LithoPanel, DepthPanel, PSPRPanel,
-                    ModPanel, HTUPanel, TadpolePanel)
+from cache import BoreholeCache, ColumnStore
+from scheduler import Scheduler
+from picker import HoleIndex, HolePicker
 from widgets import ControlButton
 
 __version__ = '0.1'
 
-style.use('bmh')
+# startup phases, in report order
+STARTUP_PHASES = ('imported', 'window mapped', 'holes listed',
+                  'first panel', 'panels built')
 
 
 class LogPlotterApp(tk.Tk):
 
     """Application-level controller class"""
 
-    def __init__(self):
+    def __init__(self, windowed=False, workers=2, engine='canvases',
+                 store_dir=None, startup_report=False):
 
         """Initialise"""
 
         tk.Tk.__init__(self)
+        self.engine = engine
+        self.startup = {}
+        self.startup_report = startup_report
+        self.mark('imported')
 
-        # set up model
-        self.model = Model(self)
+        # set up background workers, model
+        self.scheduler = Scheduler(self, workers=workers)
+        self.model = Model(self, windowed=windowed, store_dir=store_dir)
 
         # set up container frame
         container = tk.Frame(self)
@@ -76,11 +88,25 @@ class LogPlotterApp(tk.Tk):
         frame = self.frames[frm]
         frame.tkraise()
 
+    def mark(self, phase):
+
+        """Record time of startup phase, report once all are done"""
+
+        self.startup[phase] = time.time() - _T0
+        if (self.startup_report and
+                all(p in self.startup for p in STARTUP_PHASES)):
+            print('startup: ' + ', '.join(
+                '{} {:.3f} s'.format(p, self.startup[p])
+                for p in STARTUP_PHASES), file=sys.stderr)
+
     @staticmethod
     def _exit():
 
         """Quit application"""
 
+        root.scheduler.shutdown()
+        for line in instrument.report():
+            logging.getLogger('logplotter').info(line)
         root.quit()
         root.destroy()
 
@@ -89,6 +115,9 @@ class ViewPage(tk.Frame):
 
     """Viewer class"""
 
+    # relative panel widths in the shared-figure engine
+    width_ratios = [1, 1, 1, 1, 1, 1, 1]
+
     # pylint: disable=too-many-instance-attributes
     def __init__(self, parent, controller):
 
@@ -107,25 +136,31 @@ class ViewPage(tk.Frame):
             self.visible[i].set(True)
 
         # add a MenuBar
-        menu = MenuBar(self)
-        self.master.config(menu=menu)
-
-        # set up log panels
-        c1 = DepthPanel(self)
-        c2 = LithoPanel(self, name='Litho.')
-        c3 = ModPanel(self, modulus='Young')
-        c4 = ModPanel(self, modulus='Poisson')
-        c5 = HTUPanel(self)
-        c6 = PSPRPanel(self)
-        c7 = TadpolePanel(self)
-        self.canvases = [c1, c2, c3, c4, c5, c6, c7]
-
-        # grid and configure log panels
-        for i, c in enumerate(self.canvases):
-            c.show()
-            c.get_tk_widget().grid(row=0, column=i+1, sticky='nsew', rowspan=6)
-            self.columnconfigure(i+1, weight=8 if i < 2 else 1)
-        self.rowconfigure(0, weight=1)
+        self.menu = MenuBar(self)
+        self.master.config(menu=self.menu)
+
+        # borehole search, filled once listed (see holes_listed)
+        self.holes = HoleIndex([])
+        self.picker = None
+        self.master.bind('<Control-f>', lambda e: self.pick_hole())
+
+        # log panels are built once the window is shown (see build_panels);
+        # per-panel canvases are None until built
+        self.host = None
+        self.canvases = []
+        self.facecolor = None
+        self.cursor = None
+        self.navigator = None
+        self.tiles = None
+        self.views = []
+        # shown depth range (ymin, ymax), None until a hole is shown
+        self.depthlims = None
+        # summary data plotted instead of the model's (see Model.overview),
+        # and the (hole, [(table, size)]) being read for it
+        self.overview = None
+        self.overview_request = None
+        self.prerender_queue = []
+        self.pending = None
 
         # add pager buttons, label
         self.pg_label = tk.Label(self, anchor='e',
@@ -147,8 +182,321 @@ class ViewPage(tk.Frame):
         self.depth_label = tk.Label(self, relief='groove', anchor='w',
                                     textvariable=self.depth_var)
         self.depth_label.grid(row=6, column=1, sticky='nsew', columnspan=2)
-        for c in self.canvases:
-            c.mpl_connect('motion_notify_event', self.on_move_event)
+        self.progress = ttk.Progressbar(self, mode='determinate', length=80)
+        self.progress.grid(row=6, column=3, sticky='ew', columnspan=2)
+        self.progress.grid_remove()
+        self.loading = False
+        self.waiting = []
+        self.remaining = 0
+        self.rowconfigure(0, weight=1)
+
+        # per-panel plot/draw times, under the panels (if instrumented)
+        self.show_timings = tk.BooleanVar()
+        self.timing_vars = [tk.StringVar() for _ in xrange(7)]
+        self.timing_labels = [
+            tk.Label(self, textvariable=v, anchor='w', justify='left',
+                     font=('TkFixedFont', 7)) for v in self.timing_vars]
+        self.bind('<Map>', self.on_map)
+
+    def on_map(self, event):
+
+        """First shown: list holes, build panels when idle"""
+
+        self.unbind('<Map>')
+        self.master.mark('window mapped')
+        self.master.model.open_db(self.holes_listed)
+        self.after_idle(self.build_panels)
+
+    def holes_listed(self, index):
+
+        """Make borehole index listed in the background searchable"""
+
+        self.holes = index
+        if self.picker is not None:
+            self.picker.set_index(index)
+        self.master.mark('holes listed')
+
+    def pick_hole(self):
+
+        """Open borehole search dialog"""
+
+        if self.picker is None:
+            self.picker = HolePicker(self.master, self.holes,
+                                     self.display_log)
+        self.picker.show()
+
+    def build_panels(self):
+
+        """Create depth cursor, tile cache and log panels
+
+        The shared figure is built at once. Panel canvases are built one
+        per idle callback, shown ones first; hidden ones wait until shown
+        or given data (see panel).
+        """
+
+        import matplotlib
+        matplotlib.use("TkAgg")
+        from panels import LogFigure, log_panels, data_columns
+        from cursor import DepthCursor
+        from navigation import DepthNavigator
+        from tiles import TileCache
+
+        self.master.model.spec = data_columns()
+        self.cursor = DepthCursor(self, [], callback=self.show_depth)
+        # rendered page tiles per view: (key, canvas, log axes, panels)
+        self.tiles = TileCache()
+        # wheel/drag navigation, previewing drags from the cached renders
+        self.navigator = DepthNavigator(self, [], self.cursor,
+                                        self.show_depths, self.current_view,
+                                        self.depth_extent,
+                                        lookup=self.lookup_tile)
+
+        if self.master.engine == 'shared':
+            host = self.host = LogFigure(self, width_ratios=self.width_ratios)
+            self.canvases = log_panels(self, host=host)
+            host.layout()
+            host.canvas.show()
+            host.canvas.get_tk_widget().grid(row=0, column=1, sticky='nsew',
+                                             rowspan=6, columnspan=7)
+            for i in xrange(7):
+                self.columnconfigure(i+1, weight=self.width_ratios[i])
+            self.add_view('shared', host.canvas, self.canvases)
+            # panels hidden before they were built
+            for i in xrange(7):
+                if not self.visible[i].get():
+                    self.toggle_panel(i)
+            self.master.mark('first panel')
+            # (all built: finish as the per-panel build does)
+            self.build_shown(7)
+        else:
+            self.canvases = [None] * 7
+            for i in xrange(7):
+                self.columnconfigure(i+1, weight=8 if i < 2 else 1)
+            self.after_idle(self.build_shown, 0)
+
+    def build_shown(self, i):
+
+        """Build first shown, unbuilt panel from column i; the next when idle"""
+
+        while i < 7 and (self.canvases[i] is not None or
+                         not self.visible[i].get()):
+            i += 1
+        if i < 7:
+            first = all(c is None for c in self.canvases)
+            self.panel(i)
+            if first:
+                self.master.mark('first panel')
+            self.after_idle(self.build_shown, i + 1)
+            return
+        self.master.mark('panels built')
+
+        # hole picked before the panels existed
+        if self.pending is not None:
+            self.display_log(self.pending)
+
+    def panel(self, i):
+
+        """Return log panel i, building its canvas first if need be"""
+
+        if self.canvases[i] is None:
+            from panels import log_panel
+            c = self.canvases[i] = log_panel(i, self)
+            c.show()
+            c.get_tk_widget().grid(row=0, column=i+1, sticky='nsew',
+                                   rowspan=6)
+            if self.facecolor is not None:
+                c.set_facecolor(self.facecolor)
+            if not self.visible[i].get():
+                c.get_tk_widget().grid_remove()
+                c.set_shown(False)
+            self.add_view(i, c, [c])
+        return self.canvases[i]
+
+    def add_view(self, key, canvas, panels):
+
+        """Add view of panels on canvas to cursor, navigation, tile cache"""
+
+        self.cursor.add_panels(panels)
+        self.navigator.add_panels(panels)
+        view = (key, canvas, panels[0].ax_log, panels)
+        self.views.append(view)
+        canvas.mpl_connect('draw_event', partial(self.on_draw, view))
+        canvas.mpl_connect('resize_event', partial(self.on_resize, view))
+
+    def show_page(self, pg):
+
+        """Show page pg, blitting cached tiles where possible"""
+
+        size = self.master.model.page_size
+        ymin, ymax = (pg-1)*size, pg*size
+        self.depthlims = (ymin, ymax)
+        for view in self.views:
+            _, canvas, ax, panels = view
+            tile = None
+            if canvas.get_tk_widget().winfo_ismapped():
+                # (hidden panels only record the new limits)
+                tile = self.tiles.get(self.tile_key(view, pg))
+            if tile is None:
+                panels[0].set_depthlims(ymin, ymax)
+            else:
+                ax.set_ylim(ymax, ymin)
+                canvas.restore_region(tile[0])
+                canvas.blit(canvas.figure.bbox)
+                self.cursor.set_background(canvas, tile[0])
+
+        # render neighbouring pages when idle
+        if not self.prerender_queue:
+            self.after_idle(self.prerender)
+        self.prerender_queue = [(view, p) for p in (pg+1, pg-1)
+                                for view in self.views]
+
+    def show_depths(self, ymin, ymax):
+
+        """Show any depth range, as whole pages where it is one"""
+
+        model = self.master.model
+        if not model.current_bh or self.loading:
+            return
+        size = model.page_size
+        if ymax - ymin == size and not ymin % size:
+            self.go_page(int(ymin // size) + 1)
+            return
+
+        # pages the view covers (top one is the current page)
+        first = int(ymin // size) + 1
+        last = max(first, int(-(-ymax // size)))
+        model.page = first
+        self.update_pager()
+        sizes = model.overview_sizes(ymax - ymin)
+        if sizes is not None:
+            data = model.overview(sizes)
+            if data is None:
+                # (shown once read, see overview_loaded)
+                self.request_overview(sizes)
+            elif data != self.overview:
+                self.redraw(data)
+        elif model.load_window(first, last):
+            self.tiles.invalidate(bh=model.current_bh)
+            self.redraw(model.data)
+        elif self.overview is not None:
+            self.redraw(model.data)
+        self.depthlims = (ymin, ymax)
+        for view in self.views:
+            view[3][0].set_depthlims(ymin, ymax)
+        model.prefetch()
+
+    def request_overview(self, sizes):
+
+        """Read the missing summaries of sizes in the background"""
+
+        model = self.master.model
+        keys = model.missing_overview(sizes)
+        request = (model.current_bh, keys)
+        if request == self.overview_request:
+            return
+        self.overview_request = request
+        scheduler = self.master.scheduler
+        scheduler.cancel('overview')
+        scheduler.submit('overview', model.fetch_overview, request,
+                         partial(self.overview_loaded, model.current_bh),
+                         partial(self.overview_failed, model.current_bh))
+
+    def overview_loaded(self, bh, tables):
+
+        """Keep read summaries, show them if still wanted"""
+
+        self.overview_request = None
+        model = self.master.model
+        model.add_overview(bh, tables)
+        if bh == model.current_bh and not self.loading:
+            self.show_depths(*self.depthlims)
+
+    def overview_failed(self, bh, error):
+
+        """Forget failed summary read (the model data stays shown)"""
+
+        self.overview_request = None
+
+    def current_view(self):
+
+        """Return shown (ymin, ymax), None if not navigable"""
+
+        if self.loading or not self.master.model.current_bh:
+            return None
+        return self.depthlims
+
+    def depth_extent(self):
+
+        """Return depth range of the current hole's pages"""
+
+        model = self.master.model
+        return 0., float(model.pagemax * model.page_size)
+
+    def lookup_tile(self, canvas, ymin, ymax):
+
+        """Return cached render of canvas at (ymin, ymax), or None"""
+
+        size = self.master.model.page_size
+        if ymax - ymin != size or ymin % size:
+            return None
+        for view in self.views:
+            if view[1] is canvas:
+                tile = self.tiles.peek(
+                    self.tile_key(view, int(ymin // size) + 1))
+                return None if tile is None else tile[0]
+        return None
+
+    def prerender(self):
+
+        """Render one queued neighbouring page into the tile cache"""
+
+        model = self.master.model
+        while self.prerender_queue:
+            view, pg = self.prerender_queue.pop(0)
+            _, canvas, ax, _ = view
+            current = self.tiles.peek(self.tile_key(view, model.page))
+            if (not 1 <= pg <= model.pagemax or current is None or
+                    self.tile_key(view, pg) in self.tiles or
+                    not canvas.get_tk_widget().winfo_ismapped()):
+                continue
+            from tiles import render_offscreen
+            self.cursor.paused = True
+            render_offscreen(canvas, ax, (pg-1)*model.page_size,
+                             pg*model.page_size)
+            canvas.restore_region(current[0])
+            self.cursor.paused = False
+            break
+        if self.prerender_queue:
+            self.after_idle(self.prerender)
+
+    def tile_key(self, view, pg):
+
+        """Return tile cache key for page pg of view"""
+
+        canvas = view[1]
+        return (self.master.model.current_bh, view[0], pg,
+                canvas.get_width_height(),
+                tuple(canvas.figure.get_facecolor()))
+
+    def on_draw(self, view, event):
+
+        """Store a freshly rendered page in the tile cache"""
+
+        # only whole pages of fully loaded panels
+        ymax, ymin = view[2].get_ylim()
+        size = self.master.model.page_size
+        if (self.master.model.current_bh is None or ymax - ymin != size or
+                ymin % size or self.overview is not None or
+                any(p in self.waiting for p in view[3])):
+            return
+        pg = int(ymin // size) + 1
+        self.tiles.put(self.tile_key(view, pg), self.tiles.capture(view[1]))
+
+    def on_resize(self, view, event):
+
+        """Drop tiles of a resized canvas"""
+
+        self.tiles.invalidate(view=view[0])
 
     def save_as_image(self):
 
@@ -160,123 +508,262 @@ class ViewPage(tk.Frame):
                   ('Adobe Portable Document Format', '*.pdf')]
         savename = asksaveasfilename(defaultextension='.png', filetypes=ftypes)
 
-        # combine figures
-        if savename:
-            figures = [c.save_image() for c in self.canvases]
-            width = sum([f.size[1] for f in figures])
-            height = max([f.size[0] for f in figures])
-            image = Image.new('RGBA', (width, height))
-            x_offset = 0
-            for f in figures:
-                image.paste(f, (x_offset, 0))
-                x_offset += f.size[0]
-
-        # save to file
+        if not savename or self.tiles is None:
+            return
+        if savename.lower().endswith('.pdf'):
+            self.save_as_pdf(savename)
+            return
+
+        # composite raw canvas buffers, encode once
+        from PIL import Image
+        from panels import composite_rgba
+        if self.host is not None:
+            canvases = [self.host.canvas]
+        else:
+            canvases = [c for i, c in enumerate(self.canvases)
+                        if c is not None and self.visible[i].get()]
+        self.cursor.paused = True
+        try:
+            image = Image.fromarray(composite_rgba(canvases), 'RGBA')
+        finally:
+            self.cursor.paused = False
+        if savename.lower().endswith(('.jpg', '.jpeg')):
+            image = image.convert('RGB')
         image.save(savename)
 
-    def display_log(self, bh):
+    def save_as_pdf(self, savename):
+
+        """Save whole current hole as vector multi-page PDF"""
 
-        """Select log to display"""
+        model = self.master.model
+        bh = model.current_bh
+        if bh is None:
+            return
+        if model.windowed or self.loading:
+            # (only some pages are loaded)
+            self.master.scheduler.submit(
+                'export', model.fetch, (bh,),
+                partial(self.write_pdf, savename, bh, model.pagemax))
+        else:
+            self.write_pdf(savename, bh, model.pagemax, model.data)
 
-        # get data dataFrame
-        data = self.master.model.get_data(bh)
+    def write_pdf(self, savename, bh, pagemax, data):
 
-        # disable pd_dn_button
-        self.pgup_button.state = 'disabled'
+        """Plot data into an off-screen figure, save all pages as PDF"""
 
-        # redraw
-        for c in self.canvases:
-            if isinstance(c, DepthPanel):
-                c.plot(data['tbl_elev'])
-            elif isinstance(c, LithoPanel):
-                c.plot(data['tbl_lith'])
-            elif isinstance(c, PSPRPanel):
-                c.plot(data['tbl_pspr'])
-            elif isinstance(c, ModPanel):
-                c.plot(data['tbl_mods'])
-            elif isinstance(c, HTUPanel):
-                c.plot(data['tbl_htus'], data['tbl_pfls'])
-            elif isinstance(c, TadpolePanel):
-                c.plot(data['tbl_dips'])
-            c.set_depthlims(0, 100)
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from panels import LogFigure, log_panels
+
+        # same size and visible panels as on screen
+        if self.host is not None:
+            figsize = self.host.fig.get_size_inches()
+        else:
+            shown = [c for i, c in enumerate(self.canvases)
+                     if c is not None and self.visible[i].get()]
+            figsize = (sum([c.fig.get_figwidth() for c in shown]),
+                       max([c.fig.get_figheight() for c in shown] or [4]))
+        host = LogFigure(width_ratios=self.width_ratios, figsize=figsize,
+                         canvas_class=FigureCanvasAgg)
+        log_panels(None, host=host)
+        host.visible = [self.visible[i].get() for i in xrange(7)]
+        host.layout()
+        host.plot(data)
+        host.save_pdf(savename, pagemax, self.master.model.page_size)
+
+    def display_log(self, bh):
+
+        """Select log to display, loading it in the background"""
+
+        if self.tiles is None:
+            self.pending = bh
+            return
+        model, scheduler = self.master.model, self.master.scheduler
+        scheduler.cancel('load')
+        scheduler.cancel('prefetch')
+        scheduler.cancel('overview')
+        self.overview_request = None
+
+        # cached: redraw at once
+        jobs = model.start_load(bh)
+        self.depthlims = (0, model.page_size)
+        self.overview = None
+        self.update_pager()
+        if not jobs:
+            self.loading = False
+            self.progress.grid_remove()
+            self.redraw(model.data)
+            self.show_page(1)
+            model.prefetch()
+            return
+
+        # fetch each table on a worker, render panels as tables arrive
+        self.loading = True
+        # (building any panel not yet built)
+        self.waiting = [self.panel(i) for i in xrange(7)]
+        self.remaining = len(jobs)
+        self.progress.configure(maximum=len(jobs), value=0)
+        self.progress.grid()
+        for table, windows in jobs:
+            scheduler.submit('load', model.fetch_table, (bh, table, windows),
+                             partial(self.table_loaded, bh, table),
+                             partial(self.load_failed, bh, table))
+
+    def table_loaded(self, bh, table, dfs):
+
+        """Add fetched table to model, plot panels that are ready"""
+
+        model = self.master.model
+        model.add_table(bh, table, dfs)
+        self.progress.step()
+
+        for c in list(self.waiting):
+            if all(t in model.data for t in c.tables):
+                c.set_data(*[model.data[t] for t in c.tables])
+                c.set_depthlims(*self.depthlims)
+                self.waiting.remove(c)
+
+        self.remaining -= 1
+        if not self.remaining:
+            model.finish_load(bh)
+            self.loading = False
+            self.progress.grid_remove()
+            self.update_pager()
+            model.prefetch()
+
+    def load_failed(self, bh, table, error):
+
+        """Abandon loading bh after fetching table failed"""
+
+        self.master.scheduler.cancel('load')
+        self.master.model.abort_load(bh)
+        self.loading = False
+        self.waiting = []
+        self.remaining = 0
+        self.progress.grid_remove()
+        self.update_pager()
+        self.depth_var.set('Failed to load {} ({})'.format(bh, table))
+
+    def redraw(self, data):
+
+        """Replot all log panels from data (model data, or an overview)"""
+
+        self.overview = None if data is self.master.model.data else data
+        for i in xrange(7):
+            c = self.panel(i)
+            c.set_data(*[data[t] for t in c.tables])
 
     def change_background(self):
 
         """Change figure background"""
 
+        if self.tiles is None:
+            return
         color = askcolor(initialcolor="#ffffff", title="Set background colour")
+        self.tiles.invalidate()
+        # (also for panels built later)
+        self.facecolor = color
         for c in self.canvases:
-            c.set_facecolor(color)
+            if c is not None:
+                c.set_facecolor(color)
 
     def toggle_panel(self, i):
 
         """Toggle log panels on/off"""
 
-        if self.visible[i]:
+        # (checkbutton has already set the variable)
+        if not self.canvases:
+            return
+        shown = self.visible[i].get()
+        if self.host is not None:
+            self.tiles.invalidate(view='shared')
+            self.host.set_column_visible(i, shown)
+        elif shown:
+            self.panel(i).get_tk_widget().grid()
+            self.canvases[i].set_shown(True)
+        elif self.canvases[i] is not None:
             self.canvases[i].get_tk_widget().grid_remove()
-        else:
-            self.canvases[i].get_tk_widget().grid()
-        self.visible[i] = not self.visible[i]
+            self.canvases[i].set_shown(False)
 
-    def on_move_event(self, event):
+    def toggle_timings(self):
 
-        """Report depth by tracking mouse position"""
+        """Show/hide per-panel timing readout"""
 
-        c = self.canvases[0]
-        f, ax = c.figure, c.ax_log
-        top = ax.get_position().y1 * f.get_size_inches()[1] * f.dpi
-        if event.inaxes and event.y < top:
-            self.depth_var.set('mD: {:.2f} m'.format(event.ydata))
+        shown = self.show_timings.get()
+        for i, label in enumerate(self.timing_labels):
+            if shown:
+                label.grid(row=7, column=i+1, sticky='ew')
+            else:
+                label.grid_remove()
+        if shown:
+            self.update_timings()
 
-    def pg_up(self):
+    def update_timings(self):
 
-        """Increment page, update pager button state"""
+        """Refresh timing readout twice a second while shown"""
 
-        # skip in no bh loaded
-        if not self.master.model.current_bh:
+        if not self.show_timings.get():
             return
+        for var, c in zip(self.timing_vars, self.canvases):
+            if c is None:
+                continue
+            # (panels in a shared figure are drawn together)
+            draw = (c.host or c).timings.get('draw')
+            var.set('plot {}\ndraw {}'.format(
+                *['{:5.1f}'.format(t * 1e3) if t is not None else '    -'
+                  for t in (c.timings.get('plot'), draw)]))
+        self.after(500, self.update_timings)
 
-        # get page number, pagemax
-        pg = self.master.model.page
-        pgmax = self.master.model.pagemax
+    def show_depth(self, depth):
 
-        # update buttons, page number
-        if pg == pgmax-1 and self.pgdn_button.state == 'normal':
-            self.pgdn_button.state = 'disabled'
-        elif pg == 1 and self.pgup_button.state == 'disabled':
-            self.pgup_button.state = 'normal'
-        self.master.model.page += 1
+        """Report depth under the cursor (None: mouse off the logs)"""
 
-        # update data
-        pg = self.master.model.page
-        ymin, ymax = (pg-1)*100, pg*100
-        for c in self.canvases:
-            c.set_depthlims(ymin, ymax)
+        if depth is not None:
+            self.depth_var.set('mD: {:.2f} m'.format(depth))
+
+    def pg_up(self):
+
+        """Show next page"""
+
+        # skip in no bh loaded, or still loading
+        model = self.master.model
+        if not model.current_bh or self.loading or \
+                model.page >= model.pagemax:
+            return
+        self.go_page(model.page + 1)
 
     def pg_dn(self):
 
-        """Decrement page, update pager button state"""
+        """Show previous page"""
 
-        # skip if no bh loaded
-        if not self.master.model.current_bh:
+        # skip if no bh loaded, or still loading
+        model = self.master.model
+        if not model.current_bh or self.loading or model.page <= 1:
             return
+        self.go_page(model.page - 1)
 
-        # get page number, pagemax
-        pg = self.master.model.page
-        pgmax = self.master.model.pagemax
+    def go_page(self, pg):
 
-        # update buttons, page number
-        if pg == pgmax and self.pgdn_button.state == 'disabled':
-            self.pgdn_button.state = 'normal'
-        elif pg <= 2 and self.pgup_button.state == 'normal':
-            self.pgup_button.state = 'disabled'
-        self.master.model.page -= 1
+        """Show whole page pg, loading its windows (windowed mode)"""
 
-        # update data
-        pg = self.master.model.page
-        ymin, ymax = (pg-1)*100, pg*100
-        for c in self.canvases:
-            c.set_depthlims(ymin, ymax)
+        model = self.master.model
+        model.page = pg
+        self.update_pager()
+        if model.load_window(pg):
+            self.tiles.invalidate(bh=model.current_bh)
+            self.redraw(model.data)
+        elif self.overview is not None:
+            self.redraw(model.data)
+        self.show_page(pg)
+        model.prefetch()
+
+    def update_pager(self):
+
+        """Enable pager buttons that lead to another page"""
+
+        model = self.master.model
+        self.pgup_button.state = 'normal' if model.page > 1 else 'disabled'
+        self.pgdn_button.state = ('normal' if model.page < model.pagemax
+                                  else 'disabled')
 
 
 class MenuBar(tk.Menu):
@@ -301,12 +788,9 @@ class MenuBar(tk.Menu):
         view_menu.add_command(label="Set background colour",
                               command=parent.change_background)
 
-        # view submenu: display borehole data
-        log_menu = tk.Menu(view_menu, tearoff=False)
-        for bh, in parent.master.model.bhs:
-            log_menu.add_command(label=bh,
-                                 command=partial(parent.display_log, bh))
-        view_menu.add_cascade(label="Display Log", menu=log_menu)
+        # display borehole data
+        view_menu.add_command(label="Display Log...", accelerator='Ctrl+F',
+                              command=parent.pick_hole)
 
         # view submenu: display panels
         panel_menu = tk.Menu(view_menu, tearoff=False)
@@ -316,6 +800,11 @@ class MenuBar(tk.Menu):
                                        variable=parent.visible[i],
                                        command=partial(parent.toggle_panel, i))
         view_menu.add_cascade(label='Toggle Panels', menu=panel_menu)
+        if instrument.ENABLED:
+            view_menu.add_checkbutton(label='Show timings', onvalue=True,
+                                      offvalue=False,
+                                      variable=parent.show_timings,
+                                      command=parent.toggle_timings)
 
         # add menus to menu bar
         self.add_cascade(label="File", menu=file_menu)
@@ -334,39 +823,466 @@ class Model(object):
     def page(self, num):
         self._page.set(num)
 
-    def __init__(self, parent):
+    dbpath = './sqlite/example2.db'
+    page_size = 100
 
-        """Initialise"""
+    # tbl_duct columns that are searchable in the borehole picker
+    index_columns = ()
+
+    # least number of summary bins over a view (see overview)
+    overview_bins = 1000
+
+    def __init__(self, parent, cache_budget=256 * 2**20, windowed=False,
+                 store_dir=None):
+
+        """Initialise
+
+        cache_budget is the borehole cache size in bytes. If windowed, only
+        the current page and one page either side are read from the db.
+        Whole holes are kept as column files under store_dir, if given.
+        """
 
         self.parent = parent
-        
-        # get boreholes from db
-        # self.bhs = json.load(open('holes.json', 'r'))
-        with dbConnect('./sqlite/example2.db') as cur:
-            self.bhs = cur.execute(dbConnect.qry_bhs).fetchall()
+
+        # {table: columns} read for the panels (None: everything)
+        self.spec = None
+
+        # boreholes and column store are set up by open_db
+        self.bhs = []
+        self.store = None
+        self.store_dir = store_dir
         self.current_bh = None
         self.data = {}
+        self.cache = BoreholeCache(cache_budget)
+        self.windowed = windowed
+        self.windows = {}
+        # {(table, bin size or None): LogTable} of the current hole
+        self.overviews = {}
+        self.updated = False
+        self._loading = None
 
         # init page numbers
-        self._page = tk.IntVar()
+        self._page = tk.IntVar(parent)
         self.page = 1
         self.pagemax = 1
 
+    def open_db(self, callback):
+
+        """List boreholes in the background, then callback(HoleIndex)"""
+
+        self.parent.scheduler.submit('index', self.read_index, (),
+                                     partial(self._db_opened, callback))
+
+    def read_index(self):
+
+        """Return (boreholes, index, column store) of the db (any thread)"""
+
+        # self.bhs = json.load(open('holes.json', 'r'))
+        db = dbConnect(self.dbpath)
+        with db as cur:
+            bhs = cur.execute(dbConnect.qry_bhs).fetchall()
+        terms = {}
+        if self.index_columns:
+            qry = 'SELECT DISTINCT hole_id, {} FROM tbl_duct;'.format(
+                db.select_list('tbl_duct', self.index_columns))
+            with db as cur:
+                for row in cur.execute(qry):
+                    terms.setdefault(row[0], []).extend(
+                        u'{}'.format(v) for v in row[1:] if v is not None)
+        index = HoleIndex([bh for bh, in bhs], terms)
+        store = None
+        if self.store_dir:
+            # (dropping entries of older db versions)
+            store = ColumnStore(self.dbpath, self.store_dir)
+            store.prune()
+        return bhs, index, store
+
+    def _db_opened(self, callback, result):
+
+        """Store borehole list and column store, pass index on"""
+
+        self.bhs, index, self.store = result
+        callback(index)
+
+    @timed('model.db_fetch')
     def db_fetch(self, bh):
 
         """Fetch data from sqlite database"""
 
-        # fetch data to dict
-        with dbConnect('./sqlite/example2.db') as cur:
-            tables = cur.execute(dbConnect.qry_tables).fetchall()
-            for t, in tables:
-                rows = cur.execute(dbConnect.qry_data.format(t, bh)).fetchall()
-                cols = zip(*cur.description)[0]
-                self.data[t] = pd.DataFrame(rows, columns=cols)
+        data = self.stored(bh)
+        if data is not None:
+            self.set_current(bh, data)
+        elif self.windowed:
+            self.windows[bh] = set()
+            self.set_current(bh, {})
+            self.load_window(self.page)
+        else:
+            data = self.fetch(bh)
+            self.cache.put(bh, data)
+            self.set_current(bh, data)
+
+    @timed('model.fetch')
+    def fetch(self, bh):
+
+        """Return {table: LogTable} for whole borehole (any thread)"""
+
+        columns = self.fetch_columns()
+        if self.store is not None:
+            data = self.store.load(bh, columns)
+            if data is None:
+                data = self.store.rebuild(bh, columns)
+            return data
+        db = dbConnect(self.dbpath)
+        return dict((t, db.fetch_table(t, bh, columns=cols))
+                    for t, cols in columns.items())
+
+    def fetch_tables(self):
+
+        """Return list of tables to read"""
+
+        if self.spec is None:
+            return dbConnect(self.dbpath).hole_tables()
+        return list(self.spec)
+
+    def table_columns(self, table):
+
+        """Return names of columns of table to read, or None for all"""
+
+        if self.spec is None:
+            return None
+        db = dbConnect(self.dbpath)
+        names = db.resolve_columns(table, self.spec[table])
+        # (depth columns are needed to merge windows)
+        names.extend(c for c in db.depth_columns(table) or ()
+                     if c not in names)
+        return names
+
+    def fetch_columns(self):
+
+        """Return {table: columns (or None for all)} to read"""
+
+        return dict((t, self.table_columns(t)) for t in self.fetch_tables())
+
+    def stored(self, bh):
+
+        """Return whole bh from the column store and cache it, or None"""
+
+        if self.store is None:
+            return None
+        data = self.store.load(bh, self.fetch_columns())
+        if data is not None:
+            self.cache.put(bh, data)
+            if self.windowed and 'tbl_elev' in data:
+                maxdepth = data['tbl_elev']['chainage'].max()
+                pages = int(1 + (maxdepth // self.page_size))
+                self.windows[bh] = set(range(1, pages+1))
+        return data
+
+    @timed('model.fetch_table.{2}')
+    def fetch_table(self, bh, table, windows=None):
+
+        """Return [LogTable] of table for (ymin, ymax) windows (any thread)
+
+        The whole table is read if windows is None or it has no depth
+        column.
+        """
+
+        db = dbConnect(self.dbpath)
+        cols = self.table_columns(table)
+        if windows is None or db.depth_columns(table) is None:
+            return [db.fetch_table(table, bh, columns=cols)]
+        return [db.fetch_table(table, bh, w, cols) for w in windows]
+
+    def fetch_windows(self, bh, windows, skip=()):
+
+        """Return {table: [LogTable]} for (ymin, ymax) windows (any thread)
+
+        Tables without a depth column are read whole, unless in skip.
+        """
+
+        db = dbConnect(self.dbpath)
+        frames = {}
+        for t in self.fetch_tables():
+            if db.depth_columns(t) is not None:
+                frames[t] = self.fetch_table(bh, t, windows)
+            elif t not in skip:
+                frames[t] = self.fetch_table(bh, t)
+        return frames
+
+    def merge_table(self, data, table, dfs):
+
+        """Merge list of fetched tables into data[table]"""
+
+        from logtable import LogTable
+        dcols = dbConnect(self.dbpath).depth_columns(table)
+        if table in data:
+            dfs = [data[table]] + dfs
+        df = LogTable.concat(dfs)
+        if dcols is not None and len(dfs) > 1:
+            if dcols[0] != dcols[1]:
+                # intervals may span a window boundary
+                df = df.drop_duplicates()
+            df = df.sort(dcols[0])
+        data[table] = df
+
+    def merge_windows(self, bh, data, frames, pages):
+
+        """Merge fetched window frames into data, mark pages as loaded"""
+
+        for t, dfs in frames.items():
+            self.merge_table(data, t, dfs)
+        self.windows.setdefault(bh, set()).update(pages)
+        self.cache.put(bh, data)
+
+    def missing_windows(self, bh, page, last=None):
+
+        """Return (pages, windows) not yet loaded in [page-1, last+1]
+
+        last defaults to page.
+        """
+
+        last = page if last is None else last
+        loaded = self.windows.get(bh, set())
+        runs = []
+        for p in range(max(1, page-1), min(self.pagemax, last+1)+1):
+            if p in loaded:
+                continue
+            if runs and runs[-1][1] == p-1:
+                runs[-1][1] = p
+            else:
+                runs.append([p, p])
+        pages = [p for a, b in runs for p in range(a, b+1)]
+        windows = [((a-1)*self.page_size, b*self.page_size) for a, b in runs]
+        return pages, windows
+
+    def resolution(self, table, span):
+
+        """Return summary bin size of table for a view of span, or None
+
+        None means the raw data, if no summary table has overview_bins
+        bins over span.
+        """
+
+        from summary import BIN_SIZES, resolution, summary_table
+        tables = dbConnect(self.dbpath).tables()
+        sizes = [s for s in BIN_SIZES if summary_table(table, s) in tables]
+        return resolution(sizes, span, self.overview_bins)
+
+    def fetch_summary(self, bh, table, size):
+
+        """Return LogTable of whole table at bin size (None: raw rows)"""
+
+        from summary import envelope, summary_table
+        if size is None:
+            return self.fetch_table(bh, table)[0]
+        cols = self.table_columns(table)
+        if cols is not None:
+            cols = ['depth'] + ['{}_{}'.format(c, s) for c in cols
+                                if c != 'depth' for s in ('min', 'max')]
+        db = dbConnect(self.dbpath)
+        return envelope(db.fetch_table(summary_table(table, size), bh,
+                                       columns=cols), size)
+
+    def overview_sizes(self, span):
 
-        # set current bh, max pages
+        """Return {table: bin size or None} to show span, or None
+
+        None (show the model data) unless some table has a summary at the
+        span's resolution. Only used in windowed mode: whole holes are
+        already in memory.
+        """
+
+        if not self.windowed or self.current_bh is None:
+            return None
+        sizes = dict((t, self.resolution(t, span))
+                     for t in self.fetch_tables())
+        return sizes if any(sizes.values()) else None
+
+    def missing_overview(self, sizes):
+
+        """Return [(table, size)] of sizes not yet read for the hole"""
+
+        return sorted(k for k in sizes.items() if k not in self.overviews)
+
+    def fetch_overview(self, bh, keys):
+
+        """Return {(table, size): LogTable} of keys (any thread)
+
+        Summarised tables are read whole at their size, the others whole
+        and raw.
+        """
+
+        return dict(((t, size), self.fetch_summary(bh, t, size))
+                    for t, size in keys)
+
+    def add_overview(self, bh, tables):
+
+        """Keep fetch_overview tables of bh, until the hole changes"""
+
+        if bh == self.current_bh:
+            self.overviews.update(tables)
+
+    def overview(self, sizes):
+
+        """Return {table: LogTable} of sizes, or None if not all read"""
+
+        if self.missing_overview(sizes):
+            return None
+        return dict((t, self.overviews[(t, size)])
+                    for t, size in sizes.items())
+
+    def set_current(self, bh, data):
+
+        """Make data the current borehole, set max pages"""
+
+        if bh != self.current_bh:
+            self.overviews = {}
+        self.data = data
         self.current_bh = bh
-        self.pagemax = int(1+(self.data['tbl_elev']['chainage'].max() // 100))
+        self.updated = False
+        if self.windowed:
+            db = dbConnect(self.dbpath)
+            maxdepth = db.fetch_max('tbl_elev', 'chainage', bh) or 0
+        elif 'tbl_elev' in self.data:
+            maxdepth = self.data['tbl_elev']['chainage'].max()
+        else:
+            # set once tbl_elev arrives
+            maxdepth = 0
+        self.pagemax = int(1+(maxdepth // self.page_size))
+
+    def start_load(self, bh):
+
+        """Begin loading bh as current borehole
+
+        Returns list of (table, windows) to fetch with fetch_table and pass
+        to add_table, or an empty list if bh was cached.
+        """
+
+        self.page = 1
+        data = self.cache.get(bh)
+        if data is None:
+            data = self.stored(bh)
+        if data is not None:
+            if bh != self.current_bh:
+                self.set_current(bh, data)
+                self.load_window(self.page)
+            self._loading = None
+            return []
+        self.windows[bh] = set()
+        self.set_current(bh, {})
+        pages, windows = [], None
+        if self.windowed:
+            pages, windows = self.missing_windows(bh, self.page)
+        self._loading = pages
+        return [(t, windows) for t in self.fetch_tables()]
+
+    def add_table(self, bh, table, dfs):
+
+        """Add table fetched for bh by start_load job"""
+
+        if bh != self.current_bh or self._loading is None:
+            return
+        self.merge_table(self.data, table, dfs)
+        if table == 'tbl_elev' and not self.windowed:
+            self.set_current(bh, self.data)
+
+    def finish_load(self, bh):
+
+        """Store fully loaded bh in the cache"""
+
+        if bh != self.current_bh or self._loading is None:
+            return
+        if self.windowed:
+            self.windows[bh].update(self._loading)
+        self._loading = None
+        self.cache.put(bh, self.data)
+
+        # store for later runs; windowed data is partial, so re-read it
+        columns = self.fetch_columns()
+        if self.store is not None and not self.store.covers(bh, columns):
+            scheduler = self.parent.scheduler
+            if self.windowed:
+                scheduler.submit('store', self.store.rebuild, (bh, columns))
+            else:
+                scheduler.submit('store', self.store.save, (bh, self.data))
+
+    def abort_load(self, bh):
+
+        """Stop loading bh, ignoring tables still arriving"""
+
+        if bh == self.current_bh:
+            self._loading = None
+
+    def load_window(self, page, last=None):
+
+        """Merge pages around page..last into current data (windowed mode)
+
+        Returns True if the current data changed since the last call.
+        """
+
+        if not self.windowed or self.current_bh is None:
+            return False
+        bh = self.current_bh
+        updated, self.updated = self.updated, False
+        pages, windows = self.missing_windows(bh, page, last)
+        if pages:
+            frames = self.fetch_windows(bh, windows, skip=set(self.data))
+            self.merge_windows(bh, self.data, frames, pages)
+        return updated or bool(pages)
+
+    def prefetch(self):
+
+        """Fetch neighbouring holes and the next page in the background"""
+
+        scheduler = self.parent.scheduler
+        scheduler.cancel('prefetch')
+        bh = self.current_bh
+        if bh is None:
+            return
+
+        # previous and next hole in bhs order
+        holes = [h for h, in self.bhs]
+        i = holes.index(bh)
+        for nb in holes[i+1:i+2] + holes[max(0, i-1):i]:
+            if nb in self.cache:
+                continue
+            if self.windowed:
+                scheduler.submit('prefetch', self.fetch_windows,
+                                 (nb, [(0, 2*self.page_size)]),
+                                 partial(self._prefetched, nb, [1, 2]))
+            else:
+                scheduler.submit('prefetch', self.fetch, (nb,),
+                                 partial(self._prefetched, nb, None))
+
+        # next page of current hole
+        if self.windowed:
+            pages, windows = self.missing_windows(bh, self.page+1)
+            if pages:
+                scheduler.submit('prefetch', self.fetch_windows,
+                                 (bh, windows, set(self.data)),
+                                 partial(self._prefetched, bh, pages))
+
+    def _prefetched(self, bh, pages, result):
+
+        """Store prefetched hole (pages None) or pages in the cache"""
+
+        if bh == self.current_bh:
+            data = self.data
+        else:
+            data = self.cache.peek(bh)
+        if pages is None:
+            if data is None:
+                self.cache.put(bh, result)
+            return
+        if data is None:
+            data = {}
+            self.windows[bh] = set()
+        elif self.windows.get(bh, set()).intersection(pages):
+            # loaded in the meantime
+            return
+        self.merge_windows(bh, data, result, pages)
+        if bh == self.current_bh:
+            self.updated = True
 
     def get_data(self, bh):
 
@@ -374,15 +1290,40 @@ class Model(object):
 
         # reload model if necessary
         if not bh == self.current_bh:
-            # TODO: check if cache contains bh
             self.page = 1
-            self.db_fetch(bh)
-            return self.data
+            data = self.cache.get(bh)
+            if data is None:
+                self.db_fetch(bh)
+            else:
+                self.set_current(bh, data)
+                self.load_window(self.page)
+        return self.data
 
 
 # main loop
 if __name__ == '__main__':
 
-    root = LogPlotterApp()
+    parser = argparse.ArgumentParser(description='Borehole log viewer')
+    parser.add_argument('--windowed', action='store_true',
+                        help='load logs page by page instead of whole holes')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='number of background fetch threads')
+    parser.add_argument('--engine', choices=['canvases', 'shared'],
+                        default='canvases',
+                        help='one canvas per panel, or one shared figure')
+    parser.add_argument('--store', metavar='DIR',
+                        default=os.path.join(os.path.expanduser('~'),
+                                             '.logplotter', 'columns'),
+                        help='on-disk column cache ("" to disable)')
+    parser.add_argument('--startup-report', action='store_true',
+                        help='print startup phase timings to stderr')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if instrument.ENABLED else logging.INFO,
+        format='%(asctime)s %(name)s %(levelname)s: %(message)s')
+    root = LogPlotterApp(windowed=args.windowed, workers=args.workers,
+                         engine=args.engine, store_dir=args.store,
+                         startup_report=args.startup_report)
     root.geometry("500x650")
     root.mainloop()
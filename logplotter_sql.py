@@ -1,30 +1,278 @@
 """
 Database interaction classes:
 
-dbConnect (class)   - Context-manager implementation of sqlite database cursor.
+dbConnect (class)   - Context-manager access to a pooled, read-only sqlite
+                      connection, plus parameterised per-borehole queries.
 """
 
+import os
 import sqlite3
+import threading
+try:
+    from urllib import pathname2url
+except ImportError:
+    from urllib.request import pathname2url
 
+from instrument import timed
 
-class dbConnect:
+# candidate depth columns, used for (hole_id, depth) indexes and windows
+DEPTH_COLUMNS = ('depth', 'chainage', 'pfl_depth', 'lithology_from')
 
-    """Implements db connection as context manager"""
+# interval tables: (top, bottom) depth columns
+INTERVAL_COLUMNS = {'tbl_lith': ('lithology_from', 'lithology_to')}
+
+
+class dbConnect(object):
+
+    """Implements db connection as context manager
+
+    Connections are opened read-only, once per thread and database, and
+    kept open for the lifetime of the thread. On first use of a database,
+    missing hole_id indexes are created on all 'tbl_*' tables.
+    """
 
     # class variables
     qry_tables = "SELECT name FROM sqlite_master WHERE type='table';"
-    qry_data = "SELECT * FROM {0} WHERE hole_id='{1}';"
+    qry_data = 'SELECT {cols} FROM "{0}" WHERE hole_id=?;'
+    qry_point = ('SELECT {cols} FROM "{0}" WHERE hole_id=? '
+                 'AND "{1}">=? AND "{1}"<?;')
+    qry_interval = ('SELECT {cols} FROM "{0}" WHERE hole_id=? '
+                    'AND "{2}">? AND "{1}"<?;')
+    qry_max = 'SELECT MAX("{1}") FROM "{0}" WHERE hole_id=?;'
     qry_bhs = "SELECT DISTINCT hole_id FROM tbl_duct ORDER BY hole_id;"
 
+    # connection settings
+    mmap_size = 256 * 2**20
+    cache_size = 64 * 2**10     # KiB
+    cached_statements = 256
+
+    _local = threading.local()
+    _lock = threading.Lock()
+    _prepared = set()
+    _tables = {}
+    _columns = {}
+    _types = {}
+
     def __init__(self, dbpath):
-        self.dbpath = dbpath
+        self.dbpath = os.path.abspath(dbpath)
         self.conn = None
         self.cursor = None
 
     def __enter__(self):
-        self.conn = sqlite3.connect(self.dbpath)
+        self.conn = self.connection()
         self.cursor = self.conn.cursor()
         return self.cursor
 
     def __exit__(self, exc_class, exc, traceback):
-        self.conn.close()
+        self.cursor.close()
+
+    def connection(self):
+
+        """Return this thread's connection, opening it if necessary"""
+
+        try:
+            conns = dbConnect._local.conns
+        except AttributeError:
+            conns = dbConnect._local.conns = {}
+        conn = conns.get(self.dbpath)
+        if conn is None:
+            with dbConnect._lock:
+                if self.dbpath not in dbConnect._prepared:
+                    self.create_indexes()
+                    dbConnect._prepared.add(self.dbpath)
+            conn = conns[self.dbpath] = self._open()
+        return conn
+
+    def _open(self):
+
+        """Open read-only connection and set pragmas"""
+
+        uri = 'file:{}?mode=ro'.format(pathname2url(self.dbpath))
+        try:
+            conn = sqlite3.connect(uri, uri=True,
+                                   cached_statements=self.cached_statements)
+        except TypeError:
+            # no URI support (python 2): fall back to a plain connection
+            conn = sqlite3.connect(self.dbpath,
+                                   cached_statements=self.cached_statements)
+        conn.execute('PRAGMA mmap_size={:d};'.format(self.mmap_size))
+        conn.execute('PRAGMA cache_size=-{:d};'.format(self.cache_size))
+        return conn
+
+    def close(self):
+
+        """Close this thread's connection"""
+
+        conns = getattr(dbConnect._local, 'conns', {})
+        conn = conns.pop(self.dbpath, None)
+        if conn is not None:
+            conn.close()
+
+    def create_indexes(self):
+
+        """Create missing (hole_id[, depth]) indexes on 'tbl_*' tables"""
+
+        conn = sqlite3.connect(self.dbpath)
+        try:
+            tables = [t for t, in conn.execute(self.qry_tables)]
+            for t in tables:
+                if not t.startswith('tbl_'):
+                    continue
+                cols = [r[1] for r in conn.execute(
+                    'PRAGMA table_info("{}");'.format(t))]
+                if 'hole_id' not in cols or self._is_indexed(conn, t):
+                    continue
+                depth = [c for c in DEPTH_COLUMNS if c in cols][:1]
+                keys = ['hole_id'] + depth
+                conn.execute('CREATE INDEX IF NOT EXISTS "idx_{0}_hole_id" '
+                             'ON "{0}" ({1});'.format(t, ', '.join(keys)))
+            conn.commit()
+        except sqlite3.OperationalError:
+            # read-only database file: use it unindexed
+            pass
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _is_indexed(conn, table):
+
+        """Return True if an index on table starts with hole_id"""
+
+        for idx in conn.execute('PRAGMA index_list("{}");'.format(table)):
+            info = conn.execute('PRAGMA index_info("{}");'.format(idx[1]))
+            first = info.fetchone()
+            if first is not None and first[2] == 'hole_id':
+                return True
+        return False
+
+    def tables(self):
+
+        """Return set of table names in the database (the whitelist)"""
+
+        names = dbConnect._tables.get(self.dbpath)
+        if names is None:
+            rows = self.connection().execute(self.qry_tables).fetchall()
+            names = dbConnect._tables[self.dbpath] = frozenset(
+                t for t, in rows)
+        return names
+
+    def hole_tables(self):
+
+        """Return sorted names of 'tbl_*' tables with a hole_id column"""
+
+        return sorted(t for t in self.tables() if t.startswith('tbl_') and
+                      'hole_id' in self.columns(t))
+
+    def check_table(self, table):
+
+        """Raise ValueError if table is not in the database"""
+
+        if table not in self.tables():
+            raise ValueError('Unknown table: {!r}'.format(table))
+
+    def columns(self, table):
+
+        """Return list of column names of table"""
+
+        key = (self.dbpath, table)
+        cols = dbConnect._columns.get(key)
+        if cols is None:
+            self.check_table(table)
+            rows = self.connection().execute(
+                'PRAGMA table_info("{}");'.format(table)).fetchall()
+            cols = dbConnect._columns[key] = [r[1] for r in rows]
+            dbConnect._types[key] = dict((r[1], r[2]) for r in rows)
+        return cols
+
+    def column_types(self, table):
+
+        """Return {column: declared type} of table"""
+
+        self.columns(table)
+        return dbConnect._types[(self.dbpath, table)]
+
+    def depth_columns(self, table):
+
+        """Return (top, bottom) depth columns of table, or None"""
+
+        if table in INTERVAL_COLUMNS:
+            return INTERVAL_COLUMNS[table]
+        cols = self.columns(table)
+        for c in DEPTH_COLUMNS:
+            if c in cols:
+                return c, c
+        return None
+
+    def resolve_columns(self, table, columns):
+
+        """Return names of columns of table, given as names or positions"""
+
+        names = self.columns(table)
+        resolved = []
+        for c in columns:
+            if isinstance(c, int):
+                c = names[c]
+            elif c not in names:
+                raise ValueError('Unknown column: {!r}'.format(c))
+            if c not in resolved:
+                resolved.append(c)
+        return resolved
+
+    def select_list(self, table, columns=None):
+
+        """Return quoted select list of columns of table (None: all)"""
+
+        if columns is None:
+            return '*'
+        return ', '.join('"{}"'.format(c)
+                         for c in self.resolve_columns(table, columns))
+
+    def select(self, table, bh, window=None, columns=None):
+
+        """Return (sql, params) reading table for bh
+
+        With window (ymin, ymax), point data are selected by depth in
+        [ymin, ymax), interval data by overlap. Tables without a depth
+        column are read whole.
+        """
+
+        self.check_table(table)
+        cols = self.select_list(table, columns)
+        dcols = self.depth_columns(table)
+        if window is None or dcols is None:
+            return self.qry_data.format(table, cols=cols), (bh,)
+        top, bottom = dcols
+        qry = self.qry_point if top == bottom else self.qry_interval
+        return (qry.format(table, top, bottom, cols=cols),
+                (bh, window[0], window[1]))
+
+    @timed('db.max')
+    def fetch_max(self, table, column, bh):
+
+        """Return maximum value of column in table for borehole bh"""
+
+        if column not in self.columns(table):
+            raise ValueError('Unknown column: {!r}'.format(column))
+        cur = self.connection().execute(self.qry_max.format(table, column),
+                                        (bh,))
+        try:
+            return cur.fetchone()[0]
+        finally:
+            cur.close()
+
+    @timed('db.table.{1}')
+    def fetch_table(self, table, bh, window=None, columns=None):
+
+        """Return LogTable of table for bh, optionally in (ymin, ymax)
+
+        Rows are read in chunks straight into typed arrays (see logtable).
+        """
+
+        from logtable import read_cursor
+
+        sql, params = self.select(table, bh, window, columns)
+        cur = self.connection().execute(sql, params)
+        try:
+            return read_cursor(cur, table, self.column_types(table))
+        finally:
+            cur.close()
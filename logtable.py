@@ -0,0 +1,304 @@
+"""
+Compact typed log tables:
+
+LogTable (class)    - Table columns as NumPy arrays, typed by a schema.
+column_dtype (func) - Storage dtype of a table column.
+read_cursor (func)  - Read query results straight into a LogTable.
+
+Measurements are float32, codes and flags small integers (NULL: -1, so
+a missing flag stays unknown), and text columns categorical: integer
+codes (NULL: -1) into a list of categories.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+# storage dtypes of table columns; 'category' is text stored as codes
+SCHEMA = {
+    'tbl_lith': {'lithology': 'category'},
+    'tbl_htus': {'flag': 'int8'},
+    'tbl_dips': {'mineralogy': 'int8', 'wcf_match': 'int8'},
+}
+
+# any table
+COMMON = {'hole_id': 'category'}
+
+
+def column_dtype(table, column, decltype=None):
+
+    """Return dtype name of column, by SCHEMA or else its declared type
+
+    Undeclared text columns are 'category', integers float64 (to keep
+    them exact, with NULL as NaN) and anything else float32.
+    """
+
+    dtype = SCHEMA.get(table, {}).get(column) or COMMON.get(column)
+    if dtype is not None:
+        return dtype
+    decltype = (decltype or '').upper()
+    if any(t in decltype for t in ('CHAR', 'CLOB', 'TEXT')):
+        return 'category'
+    if 'INT' in decltype:
+        return 'float64'
+    return 'float32'
+
+
+def _code_dtype(n):
+
+    """Return smallest signed integer dtype for codes 0..n-1 and -1"""
+
+    for dtype in (np.int8, np.int16, np.int32):
+        if n <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _encode(values, index):
+
+    """Return int64 codes of values, adding new ones to {value: code}"""
+
+    codes = np.empty(len(values), dtype=np.int64)
+    for i, value in enumerate(values):
+        if value is None or value != value:
+            codes[i] = -1
+        else:
+            codes[i] = index.setdefault(value, len(index))
+    return codes
+
+
+def _convert(raw, dtype):
+
+    """Return float64 column raw (NULL: NaN) as dtype
+
+    Integer columns are widened as needed to hold all their values.
+    """
+
+    if np.dtype(dtype).kind in 'iu':
+        values = np.where(np.isnan(raw), -1, raw)
+        if len(values):
+            # (wider than the schema's dtype, rather than wrapping around)
+            lo, hi = values.min(), values.max()
+            size = np.dtype(dtype).itemsize
+            for wider in (np.int8, np.int16, np.int32, np.int64):
+                info = np.iinfo(wider)
+                if (np.dtype(wider).itemsize >= size and
+                        info.min <= lo and hi <= info.max):
+                    dtype = wider
+                    break
+        return values.astype(dtype)
+    return raw.astype(dtype)
+
+
+def _differ(a, b):
+
+    """Return a != b elementwise, counting NaN as equal to NaN"""
+
+    if a.dtype.kind != 'f':
+        return a != b
+    return (a != b) & ~(np.isnan(a) & np.isnan(b))
+
+
+class LogTable(object):
+
+    """Columns of a log table as typed arrays
+
+    Columns are read as attributes (table.depth) or items, by name or
+    position (table['depth'], table[0]); categorical columns are then
+    decoded to object arrays. Use codes() and map() to work on the codes
+    instead.
+    """
+
+    def __init__(self, arrays, categories=None):
+
+        """Initialise with {name: array} (ordered) and {name: categories}
+
+        The arrays of categorical columns hold codes into categories.
+        """
+
+        self._arrays = OrderedDict(arrays)
+        self._categories = dict(categories or {})
+
+    @classmethod
+    def from_arrays(cls, table, arrays, types=None):
+
+        """Return LogTable of {name: array} (ordered), typed by schema"""
+
+        typed = OrderedDict()
+        categories = {}
+        for name, values in arrays.items():
+            dtype = column_dtype(table, name, (types or {}).get(name))
+            if dtype == 'category':
+                index = OrderedDict()
+                codes = _encode(values, index)
+                typed[name] = codes.astype(_code_dtype(len(index)))
+                categories[name] = list(index)
+            else:
+                typed[name] = _convert(np.asarray(values, dtype=float), dtype)
+        return cls(typed, categories)
+
+    @property
+    def columns(self):
+        return list(self._arrays)
+
+    def __len__(self):
+        if not self._arrays:
+            return 0
+        return len(next(iter(self._arrays.values())))
+
+    def __contains__(self, name):
+        return name in self._arrays
+
+    def __getitem__(self, key):
+
+        """Return column by name or position, categories decoded"""
+
+        name = self.columns[key] if isinstance(key, int) else key
+        values = self._arrays[name]
+        if name not in self._categories:
+            return values
+        lookup = np.empty(len(self._categories[name]) + 1, dtype=object)
+        lookup[:-1] = self._categories[name]
+        lookup[-1] = None
+        return lookup[values]
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self._arrays:
+            raise AttributeError(name)
+        return self[name]
+
+    @property
+    def nbytes(self):
+
+        """Return memory used by the arrays and categories (bytes)"""
+
+        total = sum(a.nbytes for a in self._arrays.values())
+        for cats in self._categories.values():
+            total += sum(len(c) for c in cats)
+        return int(total)
+
+    def codes(self, name):
+
+        """Return (codes, categories) of a categorical column"""
+
+        return self._arrays[name], self._categories[name]
+
+    def categories(self, name):
+
+        """Return categories of column name, or None if not categorical"""
+
+        return self._categories.get(name)
+
+    def array(self, name):
+
+        """Return stored array of column name (codes, if categorical)"""
+
+        return self._arrays[name]
+
+    def map(self, name, mapping, default=None):
+
+        """Return list of mapping[value] per row (default if missing)"""
+
+        if name in self._categories:
+            values = self._categories[name]
+            lookup = [mapping.get(v, default) for v in values] + [default]
+            return [lookup[c] for c in self._arrays[name]]
+        return [mapping.get(v, default) for v in self._arrays[name].tolist()]
+
+    def take(self, index):
+
+        """Return new LogTable of the rows at index"""
+
+        return LogTable(((n, a[index]) for n, a in self._arrays.items()),
+                        self._categories)
+
+    def sort(self, name):
+
+        """Return new LogTable sorted (stably) by column name"""
+
+        return self.take(np.argsort(self._arrays[name], kind='mergesort'))
+
+    def drop_duplicates(self):
+
+        """Return new LogTable without repeated rows, in first-seen order"""
+
+        if len(self) < 2:
+            return self
+        arrays = list(self._arrays.values())
+        order = np.lexsort(arrays[::-1])
+        new = np.ones(len(order), dtype=bool)
+        new[1:] = np.any([_differ(a[order[1:]], a[order[:-1]])
+                          for a in arrays], axis=0)
+        return self.take(np.sort(order[new]))
+
+    @classmethod
+    def concat(cls, tables):
+
+        """Return LogTable of the rows of tables (same columns) in order"""
+
+        first = tables[0]
+        if len(tables) == 1:
+            return first
+        arrays = OrderedDict()
+        categories = {}
+        for name in first.columns:
+            if name not in first._categories:
+                arrays[name] = np.concatenate([t._arrays[name]
+                                               for t in tables])
+                continue
+            # recode each table's codes into merged categories
+            index = OrderedDict()
+            parts = []
+            for t in tables:
+                cats = t._categories[name]
+                lookup = np.array([index.setdefault(c, len(index))
+                                   for c in cats] + [-1], dtype=np.int64)
+                parts.append(lookup[t._arrays[name]])
+            arrays[name] = np.concatenate(parts).astype(
+                _code_dtype(len(index)))
+            categories[name] = list(index)
+        return cls(arrays, categories)
+
+
+def read_cursor(cursor, table, types=None, size=8192):
+
+    """Return LogTable of the rows of an executed cursor
+
+    Rows are fetched size at a time and converted to typed columns, so
+    no more than one chunk of row tuples is held at once. types maps
+    column names to declared (SQL) types.
+    """
+
+    names = [d[0] for d in cursor.description]
+    dtypes = [column_dtype(table, n, (types or {}).get(n)) for n in names]
+
+    # chunks are read NULL-safe: text as objects, numbers as floats
+    raw = np.dtype([('f{}'.format(i), 'O' if dt == 'category' else
+                     'f4' if dt == 'float32' else 'f8')
+                    for i, dt in enumerate(dtypes)])
+    parts = [[] for _ in names]
+    indexes = [OrderedDict() for _ in names]
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        chunk = np.array(rows, dtype=raw)
+        del rows
+        for i, dtype in enumerate(dtypes):
+            values = chunk['f{}'.format(i)]
+            if dtype == 'category':
+                parts[i].append(_encode(values, indexes[i]))
+            else:
+                parts[i].append(_convert(values, dtype))
+
+    arrays = OrderedDict()
+    categories = {}
+    for name, dtype, chunks, index in zip(names, dtypes, parts, indexes):
+        if dtype == 'category':
+            codes = np.concatenate(chunks) if chunks else np.empty(0)
+            arrays[name] = codes.astype(_code_dtype(len(index)))
+            categories[name] = list(index)
+        else:
+            arrays[name] = (np.concatenate(chunks) if chunks else
+                            np.empty(0, dtype=dtype))
+    return LogTable(arrays, categories)
@@ -0,0 +1,235 @@
+"""
+Continuous depth navigation:
+
+DepthNavigator (class) - Wheel scrolling and zoom, and drag panning of the
+                         depth view, coalesced to one update per frame.
+"""
+
+
+class DepthNavigator(object):
+
+    """Scroll, zoom and pan the depth view of log panels
+
+    The wheel scrolls by a fraction of the view, Ctrl+wheel zooms about
+    the depth under the mouse and dragging pans. Input only moves a target
+    view; at most once per frame the target is passed to
+    callback(ymin, ymax), which sets the depth limits of all panels and
+    requests a draw_idle.
+
+    While dragging, frames shift the last rendered image of each canvas
+    (the depth cursor's background) instead, filling the exposed strip
+    from lookup(canvas, ymin, ymax) if that view is cached. The panels
+    are rendered for real once the drag pauses or ends.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, widget, panels, cursor, callback, view, extent,
+                 lookup=None, interval=16, settle=150):
+
+        """Initialise
+
+        widget is the Tk widget for after(), panels the log panels,
+        cursor their DepthCursor. view() returns the shown (ymin, ymax),
+        or None if navigation is not possible, and extent() the depth
+        range that may be shown.
+        """
+
+        self.widget = widget
+        self.cursor = cursor
+        self.callback = callback
+        self.view = view
+        self.extent = extent
+        self.lookup = lookup
+        self.interval = interval
+        self.settle = settle
+        self.target = None
+        self.drag = None
+        self.log_axes = set()
+        self.axes = {}
+        self._scheduled = False
+        self._settling = None
+
+        # scroll step (fraction of view), zoom per wheel step, min span (m)
+        self.step = .1
+        self.zoom = 1.25
+        self.min_span = 1.
+
+        self.add_panels(panels)
+
+    def add_panels(self, panels):
+
+        """Add log panels, e.g. built after the navigator"""
+
+        # the log axes of each canvas
+        new = []
+        for panel in panels:
+            canvas = panel if panel.host is None else panel.host.canvas
+            if canvas not in self.axes:
+                new.append(canvas)
+                self.axes[canvas] = panel.ax_log
+            self.log_axes.update(panel.axes[1:])
+        for canvas in new:
+            canvas.mpl_connect('scroll_event', self.on_scroll)
+            canvas.mpl_connect('button_press_event', self.on_press)
+            canvas.mpl_connect('motion_notify_event', self.on_move)
+            canvas.mpl_connect('button_release_event', self.on_release)
+
+    def _start(self):
+
+        """Return view to move from: pending target, else shown view"""
+
+        return self.target or self.view()
+
+    def on_scroll(self, event):
+
+        """Scroll (zoom with Ctrl) by wheel steps"""
+
+        lims = self._start()
+        if lims is None or self.drag or event.inaxes not in self.log_axes:
+            return
+        ymin, ymax = lims
+        if event.key is not None and 'control' in event.key:
+            # zoom in on wheel up, keeping the mouse depth in place
+            f = self.zoom ** -event.step
+            d = event.ydata
+            self.move(d - (d - ymin) * f, d + (ymax - d) * f)
+        else:
+            dy = -event.step * self.step * (ymax - ymin)
+            self.move(ymin + dy, ymax + dy)
+
+    def on_press(self, event):
+
+        """Start panning with the left button"""
+
+        lims = self._start()
+        if lims is None or event.button != 1 or \
+                event.inaxes not in self.log_axes:
+            return
+        height = max(self.axes[event.canvas].bbox.height, 1)
+        self.drag = (event.y, lims, (lims[1] - lims[0]) / height)
+        self.cursor.held = True
+
+    def on_move(self, event):
+
+        """Pan: the depth under the mouse follows it"""
+
+        if self.drag is None:
+            return
+        y0, (ymin, ymax), per_pixel = self.drag
+        dy = (event.y - y0) * per_pixel
+        self.move(ymin + dy, ymax + dy)
+
+    def on_release(self, event):
+
+        """Stop panning, render the final view"""
+
+        if self.drag is None:
+            return
+        self.drag = None
+        self.cursor.held = False
+        if self._settling is not None:
+            self.widget.after_cancel(self._settling)
+            self._settling = None
+        if self.target is not None:
+            self._schedule()
+
+    def move(self, ymin, ymax):
+
+        """Move view to (ymin, ymax) at the next frame"""
+
+        self.target = self.clamp(ymin, ymax)
+        self._schedule()
+
+    def clamp(self, ymin, ymax):
+
+        """Return (ymin, ymax) limited to extent() and min_span"""
+
+        lo, hi = self.extent()
+        span = min(max(ymax - ymin, self.min_span), max(hi - lo,
+                                                        self.min_span))
+        ymin = min(max(ymin, lo), hi - span)
+        return ymin, ymin + span
+
+    def _schedule(self):
+        if not self._scheduled:
+            self._scheduled = True
+            self.widget.after(self.interval, self._update)
+
+    def _update(self):
+
+        """Apply target view, or preview it while dragging"""
+
+        self._scheduled = False
+        if self.target is None:
+            return
+        if self.drag is not None and self.preview(*self.target):
+            # render for real once the mouse rests
+            if self._settling is not None:
+                self.widget.after_cancel(self._settling)
+            self._settling = self.widget.after(self.settle, self._apply)
+            return
+        self._apply()
+
+    def _apply(self):
+
+        """Pass target view to callback"""
+
+        self._settling = None
+        if self.target is not None:
+            ymin, ymax = self.target
+            self.target = None
+            self.callback(ymin, ymax)
+
+    def preview(self, ymin, ymax):
+
+        """Blit last renders shifted to (ymin, ymax)
+
+        Returns False (drawing nothing) if a canvas has no render of the
+        same span, or the shift is larger than its log axes.
+        """
+
+        shifts = []
+        for canvas, ax in self.axes.items():
+            if not canvas.get_tk_widget().winfo_ismapped():
+                continue
+            background = self.cursor.backgrounds.get(canvas)
+            lims = self.cursor.depthlims.get(canvas)
+            if background is None or lims is None:
+                return False
+            rmax, rmin = lims
+            if abs((rmax - rmin) - (ymax - ymin)) > 1e-9 * (rmax - rmin):
+                return False
+            # log axes rows, counted from the top as in Agg buffers
+            rows = int(round(canvas.figure.bbox.height))
+            top = rows - int(round(ax.bbox.y1))
+            bottom = rows - int(round(ax.bbox.y0))
+            height = bottom - top
+            shift = int(round((rmin - ymin) * height / (rmax - rmin)))
+            if abs(shift) >= height:
+                return False
+            shifts.append((canvas, background, (rmin, rmax), top, bottom,
+                           shift))
+
+        for canvas, background, (rmin, rmax), top, bottom, shift in shifts:
+            width = int(round(canvas.figure.bbox.width))
+            height = bottom - top
+            canvas.restore_region(background)
+            # (xy offsets the whole region, so rows move by shift)
+            canvas.restore_region(
+                background, bbox=(0, top + max(0, -shift), width,
+                                  bottom - max(0, shift)), xy=(0, shift))
+
+            # fill the exposed strip from a cached neighbouring view
+            span = rmax - rmin
+            tile = None
+            if shift < 0 and self.lookup is not None:
+                tile = self.lookup(canvas, rmin + span, rmax + span)
+                strip, offset = (0, top, width, top - shift), height + shift
+            elif shift > 0 and self.lookup is not None:
+                tile = self.lookup(canvas, rmin - span, rmax - span)
+                strip, offset = (0, bottom - shift, width, bottom), \
+                    shift - height
+            if tile is not None:
+                canvas.restore_region(tile, bbox=strip, xy=(0, offset))
+            canvas.blit(canvas.figure.bbox)
+        return True
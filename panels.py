@@ -1,50 +1,237 @@
 """
 Log-panel classes:
 
-BasePanel (class)  -   Base class for log panels.
+LogFigure (class)    - Single figure hosting log panels as columns.
+BasePanel (class)    - Base class for log panels.
 DepthPanel (class)   - Depth panel, showing chainage and elevation.
 LithoPanel (class)   - Lithology panel, showing rock-type or ductile domain.
 ModPanel (class)     - Panel for displaying elastic moduli data.
 PSPRPanel (class)    - Panel for displaying PFL-SPR measurements.
 HTUPanel (class)     - Panel to display HTU and PFL transmissivity data.
 TadpolePanel (class) - Panel to display fracture orientation 'tadpoles'.
+log_panel (func)     - Create one of the standard log panels.
+log_panels (func)    - Create the standard set of seven log panels.
+data_columns (func)  - Tables and columns a list of panels reads.
+composite_rgba (func) - Place the RGBA buffers of canvases side by side.
 
 TODO:
  * Store colours, properties in separate module.
 """
 
 from __future__ import print_function, division
-from math import sin, cos, radians
-import io
 from PIL import Image
-import pandas as pd
 import numpy as np
 
-import matplotlib
-matplotlib.use("TkAgg")
+# (the backend is chosen by the caller: TkAgg in the app, Agg headless)
 import matplotlib.pyplot as plt
 from matplotlib import style
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib import patches
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+try:
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+except ImportError:
+    # no Tk: headless use only, panels drawn into a LogFigure
+    FigureCanvasTkAgg = FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+from matplotlib.ticker import MaxNLocator
+from matplotlib.transforms import Affine2D
+
+from instrument import ENABLED, timed
+from lod import MinMaxPyramid
 
 style.use('bmh')
 
 
+class LogFigure(object):
+
+    """Figure with log panels as columns sharing one depth axis
+
+    Panels created with host=LogFigure draw into a column of this figure
+    instead of their own canvas, so setting depth limits is one set_ylim
+    and one draw_idle for all panels.
+    """
+
+    def __init__(self, parent=None, width_ratios=None, figsize=(7, 4),
+                 canvas_class=FigureCanvasTkAgg):
+
+        """Initialise figure and canvas (headless if parent is None)"""
+
+        self.fig = Figure(figsize=figsize)
+        if parent is None:
+            self.canvas = canvas_class(self.fig)
+        else:
+            self.canvas = canvas_class(self.fig, parent)
+        self.width_ratios = width_ratios
+        self.panels = []
+        self.visible = []
+
+        # last render time (s) of the whole figure, if instrumented
+        self.timings = {}
+        if ENABLED:
+            self.canvas.draw = timed('draw.LogFigure', self.timings)(
+                self.canvas.draw)
+
+    def add_column(self, panel):
+
+        """Add header and log axes for panel, return them as array"""
+
+        share = self.panels[0].ax_log if self.panels else None
+        # (matplotlib 2 returns the existing axes for repeated add_axes
+        # arguments, so each column's are labelled apart)
+        i = len(self.panels)
+        ax_hdr = self.fig.add_axes([0, 0, 1, 1], label='hdr{}'.format(i))
+        ax_log = self.fig.add_axes([0, 0, 1, 1], sharey=share,
+                                   label='log{}'.format(i))
+        if share is None:
+            # shared axes only notify the first one
+            ax_log.callbacks.connect('ylim_changed', self.on_ylim_changed)
+        self.panels.append(panel)
+        self.visible.append(True)
+        return np.array([ax_hdr, ax_log])
+
+    def check_columns(self):
+
+        """Raise RuntimeError unless each column has axes of its own"""
+
+        for name in ('ax_hdr', 'ax_log'):
+            if len(set(getattr(p, name) for p in self.panels)) != \
+                    len(self.panels):
+                raise RuntimeError('Log columns share {} axes'.format(name))
+
+    def layout(self):
+
+        """Position visible columns by width ratio, hide the others"""
+
+        left, right, bottom, top, wspace, hspace = .02, .98, .04, .98, .01, .02
+        shown = [i for i, v in enumerate(self.visible) if v]
+        ratios = self.width_ratios or [1] * len(self.panels)
+        total = sum(ratios[i] for i in shown) or 1
+        width = right - left - wspace * max(len(shown)-1, 0)
+        split = bottom + (top - bottom - hspace) * 12 / 13.
+        x = left
+        for i, panel in enumerate(self.panels):
+            for ax in panel.axes:
+                ax.set_visible(self.visible[i])
+            if not self.visible[i]:
+                continue
+            w = width * ratios[i] / total
+            panel.ax_hdr.set_position([x, split + hspace, w,
+                                       top - split - hspace])
+            for ax in panel.axes[1:]:
+                ax.set_position([x, bottom, w, split - bottom])
+            x += w + wspace
+
+    def on_ylim_changed(self, ax):
+
+        """Pass depth view changes on to all panels"""
+
+        for panel in self.panels:
+            panel.on_ylim_changed(ax)
+
+    def set_column_visible(self, i, visible):
+
+        """Show/hide column i"""
+
+        self.visible[i] = visible
+        self.panels[i].set_shown(visible)
+        self.layout()
+        self.draw_idle()
+
+    def set_depthlims(self, ymin, ymax):
+
+        """Set depth limits on all columns"""
+
+        self.panels[0].ax_log.set_ylim(ymax, ymin)
+        self.draw_idle()
+
+    def draw_idle(self):
+
+        """Request a redraw of the figure"""
+
+        self.canvas.draw_idle()
+
+    def plot(self, data):
+
+        """Plot data ({table: LogTable}) into all panels"""
+
+        for panel in self.panels:
+            panel.plot(*[data[t] for t in panel.tables])
+
+    @timed('export.pdf')
+    def save_pdf(self, path, pagemax, page_size=100):
+
+        """Save pages 1..pagemax as one vector multi-page PDF"""
+
+        # (pages step the first column's depth axis, which the others share)
+        self.check_columns()
+        ax = self.panels[0].ax_log
+        lims = ax.get_ylim()
+        with PdfPages(path) as pdf:
+            for pg in range(1, pagemax+1):
+                ax.set_ylim(pg*page_size, (pg-1)*page_size)
+                pdf.savefig(self.fig)
+        ax.set_ylim(lims)
+
+    def save_image(self):
+
+        """Return figure as pillow.Image instance"""
+
+        return Image.fromarray(composite_rgba([self.canvas]), 'RGBA')
+
+
 class BasePanel(FigureCanvasTkAgg):
 
-    """Log panel class"""
+    """Log panel class
+
+    If host (a LogFigure) is given, the panel is a column of the host
+    figure: it has no canvas of its own, so only the plotting methods and
+    draw() may be used; events and widgets belong to host.canvas.
+    """
+
+    # (table, columns) passed to plot(), in argument order; columns are
+    # names, or positions for tables read by position
+    data_spec = ()
+
+    @property
+    def tables(self):
+        return tuple(t for t, _ in self.data_spec)
+
+    @classmethod
+    def spec_of(cls, **kwargs):
+
+        """Return data_spec of a panel made with keyword arguments kwargs"""
 
-    def __init__(self, parent):
+        return cls.data_spec
+
+    def __init__(self, parent, host=None):
 
         """Initialise"""
 
+        # (line, MinMaxPyramid) pairs, decimated to the view
+        self.curves = []
+        # last plot/draw times (s), if instrumented
+        self.timings = {}
+        # while hidden, changes are only recorded (see set_shown)
+        self.shown = True
+        self.dirty = False
+        self._pending_plot = None
+        self._pending_lims = None
+
         # set up figure, axes
         self.parent = parent
-        gs_kw = {'height_ratios': [1, 12]}
-        self.fig, self.axes = plt.subplots(nrows=2, #sharex=True,
-                                           figsize=(1, 4), gridspec_kw=gs_kw)
+        self.host = host
+        if host is None:
+            gs_kw = {'height_ratios': [1, 12]}
+            self.fig, self.axes = plt.subplots(nrows=2, #sharex=True,
+                                               figsize=(1, 4),
+                                               gridspec_kw=gs_kw)
+            FigureCanvasTkAgg.__init__(self, self.fig, self.parent)
+        else:
+            self.fig = host.fig
+            self.axes = host.add_column(self)
         self.ax_hdr, self.ax_log = self.axes
-        FigureCanvasTkAgg.__init__(self, self.fig, self.parent)
 
         # format axes
         self.fig.set_facecolor('w')
@@ -53,54 +240,155 @@ class BasePanel(FigureCanvasTkAgg):
             ax.yaxis.set_major_formatter(plt.NullFormatter())
             ax.tick_params(labelsize=8)
         self.ax_hdr.grid(False)
-        self.ax_log.invert_yaxis()
+        if not self.ax_log.yaxis_inverted():
+            # (shared with other columns in a LogFigure)
+            self.ax_log.invert_yaxis()
         plt.setp(self.ax_hdr.get_yticklines(), visible=False)
         plt.setp(self.ax_hdr.get_xticklines(), visible=False)
-        self.fig.subplots_adjust(left=.08, right=.92, hspace=.02,
-                                 bottom=.04, top=.98)
+        if host is None:
+            self.fig.subplots_adjust(left=.08, right=.92, hspace=.02,
+                                     bottom=.04, top=.98)
+            self.ax_log.callbacks.connect('ylim_changed',
+                                          self.on_ylim_changed)
+
+    def on_ylim_changed(self, ax=None):
+
+        """Set curve data to the level of detail of the new depth view"""
+
+        if not self.curves:
+            return
+        # (shared axes get the new limits only after the callbacks ran)
+        ymax, ymin = (ax or self.ax_log).get_ylim()
+        pixels = max(int(self.ax_log.bbox.height), 1)
+        for line, pyramid in self.curves:
+            line.set_data(*pyramid.select(ymin, ymax, pixels))
+
+    @timed('draw.{0.__class__.__name__}')
+    def draw(self):
+
+        """Render panel, or request a render of the host figure"""
+
+        if self.host is None:
+            FigureCanvasTkAgg.draw(self)
+        else:
+            self.host.draw_idle()
+
+    def draw_idle(self):
+
+        """Request one render of panel (or host) when idle
+
+        A hidden panel is only marked dirty, and rendered once shown.
+        """
+
+        if self.host is not None:
+            self.host.draw_idle()
+        elif self.shown:
+            FigureCanvasTkAgg.draw_idle(self)
+        else:
+            self.dirty = True
 
+    def set_data(self, *tables, **kwargs):
+
+        """Plot tables, or keep them for set_shown if hidden"""
+
+        if self.shown:
+            self.plot(*tables, **kwargs)
+        else:
+            self._pending_plot = (tables, kwargs)
+            self.dirty = True
+
+    def set_shown(self, shown):
+
+        """Show/hide panel; when shown, apply changes made while hidden"""
+
+        self.shown = shown
+        if not shown or not self.dirty:
+            return
+        self.dirty = False
+        if self._pending_plot is not None:
+            tables, kwargs = self._pending_plot
+            self._pending_plot = None
+            self.plot(*tables, **kwargs)
+        if self._pending_lims is not None:
+            ymin, ymax = self._pending_lims
+            self._pending_lims = None
+            self.ax_log.set_ylim(ymax, ymin)
+        self.draw_idle()
+
+    @timed('depthlims.{0.__class__.__name__}')
     def set_depthlims(self, ymin, ymax):
 
-        """Set depth limits on log panel"""
+        """Set depth limits on log panel, render when idle"""
 
+        # (columns of a host share their depth axis, so always apply)
+        if not self.shown and self.host is None:
+            self._pending_lims = (ymin, ymax)
+            self.dirty = True
+            return
         self.ax_log.set_ylim(ymax, ymin)
-        self.draw()
+        self.draw_idle()
         
-    def clear_axes(self):
+    @staticmethod
+    def autoscale_x(ax, *arrays):
+
+        """Autoscale x-axis of ax to the finite values in arrays
+
+        Needed for artists updated in place, which (unlike newly added
+        artists) do not update the axes' data limits.
+        """
+
+        x = np.concatenate([np.ravel(a) for a in arrays]).astype(float)
+        x = x[np.isfinite(x)]
+        if ax.get_xscale() == 'log':
+            x = x[x > 0]
+        if len(x):
+            ax.dataLim.intervalx = x.min(), x.max()
+            ax.autoscale_view(scaley=False)
+
+    def text_pool(self, pool, n, **kwargs):
 
-        """Clear axes for replotting"""
+        """Return n reusable text artists from list pool, hide the rest"""
 
-        for ax in self.axes[1:]:
-            del ax.lines[:], ax.artists[:], ax.texts[:]
+        while len(pool) < n:
+            pool.append(self.ax_log.text(0, 0, '', **kwargs))
+        for txt in pool[:n]:
+            txt.set_visible(True)
+        for txt in pool[n:]:
+            txt.set_visible(False)
+        return pool[:n]
 
     def set_facecolor(self, color):
 
         """Set panel background colour"""
 
         self.fig.set_facecolor(color[1])
-        self.draw()
+        self.draw_idle()
 
     def save_image(self):
 
         """Return figure as pillow.Image instance"""
 
-        buf = io.BytesIO()
-        self.fig.savefig(buf, format='png')
-        buf.seek(0)
-        img = Image.open(buf)
-        buf.close()
-        return img
+        return Image.fromarray(composite_rgba([self]), 'RGBA')
 
 
 class DepthPanel(BasePanel):
 
     """Depth panel"""
 
-    def __init__(self, parent):
+    data_spec = (('tbl_elev', ('chainage', 'elevation')),)
+
+    def __init__(self, parent, host=None):
 
         """Initialise"""
 
-        super(DepthPanel, self).__init__(parent)
+        # (labelled on depth view changes, which start in __init__)
+        self.chainage_labels = []
+        self.elevation_labels = []
+        # round depths, about one per 40 pixels of the view
+        self.locator = MaxNLocator(steps=[1, 2, 5, 10], integer=True)
+        self.elevation = None
+
+        super(DepthPanel, self).__init__(parent, host)
         self.parent = parent
 
         self.ax_log.grid(False)
@@ -109,41 +397,76 @@ class DepthPanel(BasePanel):
         self.ax_hdr.text(0.5, 0.5, 'Depth', va='center', ha='center',
                          rotation=90, size=11, weight='semibold')
 
+    @timed('plot.{0.__class__.__name__}')
     def plot(self, df):
 
         """Plot measured depth and elevation"""
 
-        self.clear_axes()
-
-        # get max pages, calculate and plot chainages
-        pagemax = self.parent.master.model.pagemax
-        labels = [int(x) for x in np.linspace(0, (pagemax+1)*100, pagemax*11)]
-        for lbl in labels:
-            self.ax_log.text(0.45, lbl, str(lbl), fontsize=10, rotation=90,
-                             va='center', ha='center', clip_on=True)
-
-        # get corresponding elevations from df and plot
-        for _, rw in df.iterrows():
-            self.ax_log.text(0.8, rw.chainage, str(int(rw.elevation)),
-                             va='center', ha='center', color='r', fontsize=8,
-                             rotation=90, clip_on=True)
+        chainage = np.asarray(df.chainage, dtype=float)
+        order = np.argsort(chainage)
+        self.elevation = (chainage[order],
+                          np.asarray(df.elevation, dtype=float)[order])
+        self.label_depths()
+
+    def on_ylim_changed(self, ax=None):
+
+        """Relabel depths for the new depth view"""
+
+        super(DepthPanel, self).on_ylim_changed(ax)
+        self.label_depths()
+
+    def label_depths(self):
+
+        """Label chainages at ticks of the view, with their elevations"""
+
+        ymax, ymin = self.ax_log.get_ylim()
+        self.locator.set_params(
+            nbins=max(2, int(self.ax_log.bbox.height // 40)))
+        ticks = [t for t in self.locator.tick_values(ymin, ymax)
+                 if ymin <= t <= ymax]
+        texts = self.text_pool(self.chainage_labels, len(ticks),
+                               fontsize=10, rotation=90, va='center',
+                               ha='center', clip_on=True)
+        for txt, tick in zip(texts, ticks):
+            txt.set_position((0.45, tick))
+            txt.set_text(str(int(tick)))
+
+        # elevations interpolated at the ticks within the survey
+        if self.elevation is None or not len(self.elevation[0]):
+            ticks = []
+        else:
+            ch, el = self.elevation
+            ticks = [t for t in ticks if ch[0] <= t <= ch[-1]]
+        texts = self.text_pool(self.elevation_labels, len(ticks),
+                               va='center', ha='center', color='r',
+                               fontsize=8, rotation=90, clip_on=True)
+        if ticks:
+            for txt, tick, elev in zip(texts, ticks, np.interp(ticks, ch, el)):
+                txt.set_position((0.8, tick))
+                txt.set_text(str(int(elev)))
 
 
 class LithoPanel(BasePanel):
 
     """Lithology data panel"""
 
-    def __init__(self, parent, name):
+    data_spec = (('tbl_lith', ('lithology_from', 'lithology_to',
+                               'lithology')),)
+
+    def __init__(self, parent, name, host=None):
 
         """Initialise"""
 
-        super(LithoPanel, self).__init__(parent)
+        super(LithoPanel, self).__init__(parent, host)
         self.parent = parent
 
         self.ax_log.grid(False)
         self.ax_hdr.text(0.5, 0.5, name, va='center', ha='center',
                          rotation=90, size=11, weight='semibold')
+        self.blocks = PolyCollection([], edgecolors='none', linewidths=0)
+        self.ax_log.add_collection(self.blocks)
 
+    @timed('plot.{0.__class__.__name__}')
     def plot(self, df):
 
         """Plot lithology-type data in blocks"""
@@ -153,17 +476,15 @@ class LithoPanel(BasePanel):
                   'MFGN': '#006466', 'QGN': '#002673', 'DB': '#3A274D',
                   'KFP': '#FF3300', 'UNKNOWN': '#C8C8C8'}
 
-        self.clear_axes()
-
-        for _, rw in df.iterrows():
-            lit_to = rw.lithology_to
-            lit_from = rw.lithology_from
-            lith = rw.lithology
-            rect = patches.Rectangle((0, lit_from), 1,
-                                     lit_to-lit_from, lw=0,
-                                     facecolor=colors.get(lith, '#757575'))
-            self.ax_log.add_patch(rect)
-        self.ax_log.set_ylim([df.lithology_from.min(), df.lithology_to.max()])
+        # one rectangle per interval, all in a single collection
+        lit_from = np.asarray(df.lithology_from, dtype=float)
+        lit_to = np.asarray(df.lithology_to, dtype=float)
+        verts = np.zeros((len(lit_from), 4, 2))
+        verts[:, 1:3, 0] = 1.
+        verts[:, :2, 1] = lit_from[:, np.newaxis]
+        verts[:, 2:, 1] = lit_to[:, np.newaxis]
+        self.blocks.set_verts(verts)
+        self.blocks.set_facecolors(df.map('lithology', colors, '#757575'))
         self.ax_log.set_xlim([0, 1])
 
 
@@ -171,13 +492,23 @@ class ModPanel(BasePanel):
 
     """Modulus data panel with twin x-axes"""
 
-    def __init__(self, parent, modulus='Young'):
+    @classmethod
+    def spec_of(cls, modulus='Young', **kwargs):
+
+        """Return data_spec of a panel of modulus"""
+
+        prefix = modulus.lower()
+        return (('tbl_mods', ('depth', prefix + '_average',
+                              prefix + '_variability')),)
+
+    def __init__(self, parent, modulus='Young', host=None):
 
         """Initialise"""
 
-        super(ModPanel, self).__init__(parent)
+        super(ModPanel, self).__init__(parent, host)
         self.parent = parent
         self.modulus = modulus
+        self.data_spec = self.spec_of(modulus=modulus)
 
         self.ax_log.grid(False)
         self.ax_hdr.text(0.5, 0.5, self.modulus, va='center', ha='center',
@@ -186,124 +517,248 @@ class ModPanel(BasePanel):
         # add twin axes for derivative
         self.ax_dlog = self.ax_log.twiny()
         self.axes = np.append(self.axes, np.array([self.ax_dlog]))
+
+        # add (empty) modulus and derivative lines
+        color = 'b' if self.modulus == 'Young' else 'r'
+        self.line, = self.ax_log.plot([], [], color+'-', lw=1.)
+        self.dline, = self.ax_dlog.plot([], [], color+'--', lw=1.)
         # for ax in self.axes:
             # ax.xaxis.set_major_formatter(plt.NullFormatter())
             # plt.setp(ax.get_yticklines(), visible=False)
             # ax.tick_params(labelsize=8)
 
+    @timed('plot.{0.__class__.__name__}')
     def plot(self, df):
 
         """Plot modulus and spatial derivative"""
 
-        self.clear_axes()
-        del self.ax_dlog.lines[:]
-
         if self.modulus == 'Young':
-            self.ax_log.plot(df.young_average, df.depth, 'b-', lw=1.)
-            self.ax_dlog.plot(df.young_variability, df.depth, 'b--', lw=1.)
+            average, variability = df.young_average, df.young_variability
 
         elif self.modulus == 'Poisson':
-            self.ax_log.plot(df.poisson_average, df.depth, 'r-', lw=1.)
-            self.ax_dlog.plot(df.poisson_variability, df.depth, 'r--', lw=1.)
+            average, variability = df.poisson_average, df.poisson_variability
+
+        self.curves = [(self.line, MinMaxPyramid(average, df.depth)),
+                       (self.dline, MinMaxPyramid(variability, df.depth))]
+        self.on_ylim_changed()
+        for ax, (_, pyramid) in zip(self.axes[1:], self.curves):
+            self.autoscale_x(ax, pyramid.x)
 
 
 class PSPRPanel(BasePanel):
 
     """PFL-SPR data panel"""
 
-    def __init__(self, parent):
+    data_spec = (('tbl_pspr', ('depth', 'resistance')),)
+
+    def __init__(self, parent, host=None):
 
         """Initialise"""
 
-        super(PSPRPanel, self).__init__(parent)
+        super(PSPRPanel, self).__init__(parent, host)
         self.parent = parent
 
         self.ax_log.grid(False)
         self.ax_hdr.text(0.5, 0.5, 'PFL-SPR', va='center', ha='center',
                          size=11, weight='semibold')
+        self.line, = self.ax_log.plot([], [], c='r', lw=1.)
 
+    @timed('plot.{0.__class__.__name__}')
     def plot(self, df):
 
         """Plot PFL-SPR data"""
 
-        self.clear_axes()
-        self.ax_log.plot(df.resistance, df.depth, c='r', lw=1.)
+        pyramid = MinMaxPyramid(df.resistance, df.depth)
+        self.curves = [(self.line, pyramid)]
+        self.on_ylim_changed()
+        self.autoscale_x(self.ax_log, pyramid.x)
 
 
 class HTUPanel(BasePanel):
 
     """HTU-PFL data panel"""
 
-    def __init__(self, parent):
+    # (HTU columns are read by position: hole_id, depth, trans, flag)
+    data_spec = (('tbl_htus', (0, 1, 2, 3)),
+                 ('tbl_pfls', ('pfl_depth', 'trans')))
+
+    def __init__(self, parent, host=None):
 
         """Initialise"""
 
-        super(HTUPanel, self).__init__(parent)
+        super(HTUPanel, self).__init__(parent, host)
         self.parent = parent
         self.ax_hdr.text(0.5, 0.5, 'HTU-PFL', va='center', ha='center',
                          size=11, weight='semibold')
 
+        # add (empty) HTU segments, PFL and off-scale PFL markers
+        self.htus = LineCollection([], lw=3., capstyle='projecting')
+        self.ax_log.add_collection(self.htus)
+        self.pfls = self.ax_log.scatter([], [], s=65, marker='D',
+                                        facecolor='c', lw=.5)
+        self.pfls_off = self.ax_log.scatter([], [], s=65, marker='D',
+                                            facecolor='none', edgecolor='c',
+                                            lw=2.)
+        self.ax_log.set_xscale('log')
+
+    @timed('plot.{0.__class__.__name__}')
     def plot(self, dfh, dfp):
 
         """Plot HTU scatters and PFL lines"""
 
-        self.clear_axes()
-
-        # plot HTU data
-        for _, rw in dfh.iterrows():
-            self.ax_log.plot([rw[2], rw[2]], [rw[1], rw[1]+1.7], 'm', lw=3.,
-                             alpha=(0.3 if rw[3] == 0 else 1.))
+        # plot HTU data: (depth, transmissivity, flag) in columns 1-3
+        depth = np.asarray(dfh[1], dtype=float)
+        trans = np.asarray(dfh[2], dtype=float)
+        flag = np.asarray(dfh[3])
+        segments = np.empty((len(depth), 2, 2))
+        segments[:, :, 0] = trans[:, np.newaxis]
+        segments[:, 0, 1] = depth
+        segments[:, 1, 1] = depth + 1.7
+        rgba = np.tile(to_rgba('m'), (len(depth), 1))
+        # (faint only if flagged 0; NULL, -1, is unknown)
+        rgba[:, 3] = np.where(flag == 0, .3, 1.)
+        self.htus.set_segments(segments)
+        self.htus.set_color(rgba)
 
         # plot PFL data
-        self.ax_log.scatter(dfp.trans, dfp.pfl_depth, s=65, marker='D',
-                            facecolor='c', lw=.5)
+        pfl_trans = np.asarray(dfp.trans, dtype=float)
+        pfl_depth = np.asarray(dfp.pfl_depth, dtype=float)
+        self.pfls.set_offsets(np.column_stack([pfl_trans, pfl_depth]))
 
         # add off-scale PFL datapoints
-        dfo = dfp[dfp.trans > 1.E-5]
-        self.ax_log.scatter([6.E-6]*len(dfo), dfo.pfl_depth, s=65, marker='D',
-                            facecolor='none', edgecolor='c', lw=2.)
-        self.ax_log.set_xscale('log')
+        off = pfl_depth[pfl_trans > 1.E-5]
+        self.pfls_off.set_offsets(
+            np.column_stack([np.full(len(off), 6.E-6), off]))
+        self.autoscale_x(self.ax_log, trans, pfl_trans,
+                         [6.E-6] if len(off) else [])
 
 
 class TadpolePanel(BasePanel):
 
     """Tadpole plot panel"""
 
-    def __init__(self, parent):
+    data_spec = (('tbl_dips', ('depth', 'dip', 'azimuth', 'mineralogy',
+                               'wcf_match')),)
+
+    def __init__(self, parent, host=None):
 
         """Initialise"""
 
-        super(TadpolePanel, self).__init__(parent)
+        super(TadpolePanel, self).__init__(parent, host)
         self.parent = parent
 
         self.ax_hdr.text(0.5, 0.5, 'Fractures', va='center', ha='center',
                          size=10, weight='semibold')
 
+        # add (empty) tails, in points about their (dip, depth) offsets
+        points = Affine2D().scale(1/72.) + self.fig.dpi_scale_trans
+        self.tails = LineCollection([], colors='k', lw=1.5, zorder=3,
+                                    offsets=np.zeros((0, 2)),
+                                    transOffset=self.ax_log.transData,
+                                    transform=points)
+        self.ax_log.add_collection(self.tails, autolim=False)
+        self.heads = self.ax_log.scatter([], [], s=30, zorder=4)
+
+    @timed('plot.{0.__class__.__name__}')
     def plot(self, df):
 
         """Plot fracture orientation tadpoles"""
 
         colors = ['#FFFFFF', '#FFFF81', '#00A3E8', '#5DE136', '#FF4A49',
                   '#FFA200', '#A349A3', '#C69376', '#E1E1E1']
-        lithos = dict(zip(xrange(9), colors))
-
-        self.clear_axes()
-
-        for _, d in df.iterrows():
-            self.ax_log.scatter(d.dip, d.depth, s=500, c='k', lw=1.5, zorder=3,
-                                marker=((0, 0), (sin(radians(d.azimuth)),
-                                                 cos(radians(d.azimuth)))))
-            if pd.notnull(d.dip) and d.wcf_match == 0:
-                self.ax_log.scatter(d.dip, d.depth, s=30, lw=.5, zorder=4,
-                                    facecolor=lithos.get(d.mineralogy))
-            else:
-                self.ax_log.scatter(TadpolePanel.coalesce([d.dip, 3.]),
-                                    d.depth, s=30, lw=2., zorder=4,
-                                    facecolor=lithos.get(d.mineralogy))
-
-    @staticmethod
-    def coalesce(items):
-
-        """Return first non-null item in list"""
-
-        return next(item for item in items if pd.notnull(item))
+        lithos = dict(zip(range(9), colors))
+
+        dip = np.asarray(df.dip, dtype=float)
+        depth = np.asarray(df.depth, dtype=float)
+        azimuth = np.radians(np.asarray(df.azimuth, dtype=float))
+
+        # tails: one segment per fracture, scaled as matplotlib scales a
+        # custom marker of size s=500
+        dx, dy = np.sin(azimuth), np.cos(azimuth)
+        length = .5 * np.sqrt(500.) / np.maximum(np.abs(dx), np.abs(dy))
+        tails = np.zeros((len(dip), 2, 2))
+        tails[:, 1, 0] = dx * length
+        tails[:, 1, 1] = dy * length
+        valid = np.isfinite(dip)
+        self.tails.set_segments(tails[valid])
+        self.tails.set_offsets(np.column_stack([dip, depth])[valid])
+
+        # heads: thin edge if open & dip known, else bold edge at dip or 3
+        # (a NULL match, -1, is not known to be open)
+        thin = valid & (np.asarray(df.wcf_match) == 0)
+        x = np.where(valid, dip, 3.)
+        self.heads.set_offsets(np.column_stack([x, depth]))
+        self.heads.set_facecolors(df.map('mineralogy', lithos, 'C0'))
+        self.heads.set_linewidths(np.where(thin, .5, 2.))
+        self.autoscale_x(self.ax_log, x)
+
+
+# the standard log panels, in column order: (class, keyword arguments)
+STANDARD_PANELS = [
+    (DepthPanel, {}),
+    (LithoPanel, {'name': 'Litho.'}),
+    (ModPanel, {'modulus': 'Young'}),
+    (ModPanel, {'modulus': 'Poisson'}),
+    (HTUPanel, {}),
+    (PSPRPanel, {}),
+    (TadpolePanel, {}),
+]
+
+
+def log_panel(i, parent, host=None):
+
+    """Return standard log panel i (a column index)"""
+
+    cls, kwargs = STANDARD_PANELS[i]
+    return cls(parent, host=host, **kwargs)
+
+
+def log_panels(parent, host=None):
+
+    """Return list of the seven standard log panels"""
+
+    return [log_panel(i, parent, host) for i in range(len(STANDARD_PANELS))]
+
+
+def data_columns(panels=None):
+
+    """Return {table: [columns]} read by panels, in first-use order
+
+    By default, those of the standard panels, without building them.
+    """
+
+    if panels is None:
+        specs = [cls.spec_of(**kwargs) for cls, kwargs in STANDARD_PANELS]
+    else:
+        specs = [panel.data_spec for panel in panels]
+    columns = {}
+    for spec in specs:
+        for table, cols in spec:
+            merged = columns.setdefault(table, [])
+            merged.extend(c for c in cols if c not in merged)
+    return columns
+
+
+@timed('export.composite')
+def composite_rgba(canvases):
+
+    """Return (height, width, 4) uint8 array of canvases side by side
+
+    Each canvas is rendered and its Agg buffer viewed as an array without
+    copying, then copied once into the preallocated result.
+    """
+
+    buffers = []
+    for canvas in canvases:
+        FigureCanvasAgg.draw(canvas)
+        renderer = canvas.get_renderer()
+        width, height = int(renderer.width), int(renderer.height)
+        buffers.append(np.frombuffer(canvas.buffer_rgba(), np.uint8)
+                       .reshape(height, width, 4))
+    out = np.zeros((max([b.shape[0] for b in buffers] or [0]),
+                    sum([b.shape[1] for b in buffers]), 4), np.uint8)
+    x = 0
+    for b in buffers:
+        out[:b.shape[0], x:x+b.shape[1]] = b
+        x += b.shape[1]
+    return out
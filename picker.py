@@ -0,0 +1,256 @@
+"""
+Borehole picker:
+
+HoleIndex (class)   - Sorted prefix index of boreholes by id and metadata.
+VirtualList (class) - Scrolling list with widgets for the visible rows only.
+HolePicker (class)  - Search-as-you-type borehole dialog.
+"""
+
+from __future__ import division
+import re
+from bisect import bisect_left
+from functools import partial
+import Tkinter as tk
+
+
+class HoleIndex(object):
+
+    """Prefix index of boreholes
+
+    Each hole is found by its id, its id without the leading letters
+    (so '01' finds KFM01A) and any metadata terms. Search is a bisection
+    of the sorted terms, so lookups stay fast for many thousand holes.
+    """
+
+    def __init__(self, holes, terms=None):
+
+        """Initialise with hole ids and optional {hole: [terms]}"""
+
+        terms = terms or {}
+        self.holes = sorted(holes)
+        entries = set()
+        for bh in self.holes:
+            for term in [bh, re.sub('^[A-Za-z]+', '', bh)] + \
+                    list(terms.get(bh, ())):
+                if term:
+                    entries.add((term.lower(), bh))
+        entries = sorted(entries)
+        self.keys = [k for k, _ in entries]
+        self.values = [bh for _, bh in entries]
+
+    def __len__(self):
+        return len(self.holes)
+
+    def search(self, text):
+
+        """Return sorted holes with a term starting with text"""
+
+        prefix = text.strip().lower()
+        if not prefix:
+            return self.holes
+        i = bisect_left(self.keys, prefix)
+        j = bisect_left(self.keys, prefix + u'\uffff')
+        return sorted(set(self.values[i:j]))
+
+
+class VirtualList(tk.Frame):
+
+    """List of strings showing a window of rows over a fixed label pool
+
+    Only one label per visible row exists, however long the list is;
+    scrolling changes the labels' text.
+    """
+
+    select_bg = '#3875D7'
+    select_fg = 'white'
+
+    def __init__(self, parent, rows=20, width=30, command=None):
+
+        """Initialise with number of visible rows, activate callback"""
+
+        tk.Frame.__init__(self, parent)
+        self.rows = rows
+        self.command = command
+        self.items = []
+        self.first = 0
+        self.selected = None
+
+        self.scrollbar = tk.Scrollbar(self, command=self.yview)
+        self.scrollbar.grid(row=0, column=1, rowspan=rows, sticky='ns')
+        self.labels = []
+        for i in range(rows):
+            label = tk.Label(self, anchor='w', width=width)
+            label.grid(row=i, column=0, sticky='ew')
+            label.bind('<Button-1>', partial(self.on_click, i))
+            label.bind('<Double-Button-1>', partial(self.on_double, i))
+            for seq in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+                label.bind(seq, self.on_wheel)
+            self.labels.append(label)
+        self.columnconfigure(0, weight=1)
+        self.bg = self.labels[0].cget('bg')
+        self.fg = self.labels[0].cget('fg')
+
+    def set_items(self, items):
+
+        """Replace list contents, select first item"""
+
+        self.items = items
+        self.first = 0
+        self.selected = 0 if items else None
+        self.refresh()
+
+    def refresh(self):
+
+        """Update label texts and scrollbar to the current window"""
+
+        for i, label in enumerate(self.labels):
+            j = self.first + i
+            sel = j == self.selected
+            label.configure(text=self.items[j] if j < len(self.items) else '',
+                            bg=self.select_bg if sel else self.bg,
+                            fg=self.select_fg if sel else self.fg)
+        n = len(self.items)
+        if n:
+            self.scrollbar.set(self.first / n,
+                               min(1., (self.first + self.rows) / n))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def yview(self, *args):
+
+        """Scrollbar command: ('moveto', f) or ('scroll', n, what)"""
+
+        if args[0] == 'moveto':
+            first = int(float(args[1]) * len(self.items))
+        else:
+            step = int(args[1]) * (self.rows if args[2] == 'pages' else 1)
+            first = self.first + step
+        self.scroll_to(first)
+
+    def scroll_to(self, first):
+
+        """Show rows from first on"""
+
+        self.first = max(0, min(first, len(self.items) - self.rows))
+        self.refresh()
+
+    def select(self, j):
+
+        """Select item j, scrolling it into view"""
+
+        if not self.items:
+            return
+        j = max(0, min(j, len(self.items) - 1))
+        self.selected = j
+        if j < self.first:
+            self.first = j
+        elif j >= self.first + self.rows:
+            self.first = j - self.rows + 1
+        self.refresh()
+
+    def move(self, step):
+
+        """Move selection by step rows"""
+
+        if self.selected is not None:
+            self.select(self.selected + step)
+
+    def activate(self):
+
+        """Call command with the selected item"""
+
+        if self.selected is not None and self.command is not None:
+            self.command(self.items[self.selected])
+
+    def on_click(self, i, event):
+        self.select(self.first + i)
+
+    def on_double(self, i, event):
+        self.select(self.first + i)
+        self.activate()
+
+    def on_wheel(self, event):
+
+        """Scroll three rows per wheel step"""
+
+        down = event.num == 5 or getattr(event, 'delta', 0) < 0
+        self.scroll_to(self.first + (3 if down else -3))
+
+
+class HolePicker(tk.Toplevel):
+
+    """Dialog to find and pick a borehole
+
+    The list is filtered as the user types, at most once per delay ms.
+    """
+
+    def __init__(self, parent, index, command, delay=150):
+
+        """Initialise with HoleIndex and command(bh) for the picked hole"""
+
+        tk.Toplevel.__init__(self, parent)
+        self.title('Display Log')
+        self.transient(parent)
+        self.command = command
+        self.delay = delay
+        self._after = None
+
+        self.text = tk.StringVar()
+        self.entry = tk.Entry(self, textvariable=self.text)
+        self.entry.grid(row=0, column=0, sticky='ew', padx=4, pady=4)
+        self.count = tk.Label(self, anchor='e')
+        self.count.grid(row=2, column=0, sticky='ew', padx=4)
+        self.list = VirtualList(self, command=self.pick)
+        self.list.grid(row=1, column=0, sticky='nsew', padx=4)
+        self.columnconfigure(0, weight=1)
+
+        self.text.trace('w', self.on_text)
+        self.entry.bind('<Down>', lambda e: self.list.move(1))
+        self.entry.bind('<Up>', lambda e: self.list.move(-1))
+        self.entry.bind('<Next>', lambda e: self.list.move(self.list.rows))
+        self.entry.bind('<Prior>', lambda e: self.list.move(-self.list.rows))
+        self.entry.bind('<Return>', lambda e: self.list.activate())
+        self.bind('<Escape>', lambda e: self.withdraw())
+        self.protocol('WM_DELETE_WINDOW', self.withdraw)
+        self.set_index(index)
+
+    def show(self):
+
+        """Show dialog with the search text selected"""
+
+        self.deiconify()
+        self.lift()
+        self.entry.focus_set()
+        self.entry.select_range(0, 'end')
+
+    def set_index(self, index):
+
+        """Search a new index"""
+
+        self.index = index
+        self.search()
+
+    def on_text(self, *args):
+
+        """Debounce typing: search once typing pauses"""
+
+        if self._after is not None:
+            self.after_cancel(self._after)
+        self._after = self.after(self.delay, self.search)
+
+    def search(self):
+
+        """Filter list to the current search text"""
+
+        self._after = None
+        holes = self.index.search(self.text.get())
+        self.list.set_items(holes)
+        self.count.configure(text='{} of {} holes'.format(
+            len(holes), len(self.index)))
+
+    def pick(self, bh):
+
+        """Hide dialog, pass picked hole on"""
+
+        self.withdraw()
+        self.command(bh)
@@ -0,0 +1,129 @@
+"""
+Background task scheduling:
+
+Scheduler (class)   - Thread pool whose results are handed back to the Tk
+                      main thread by after() polling.
+"""
+
+import sys
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Scheduler(object):
+
+    """Run functions on worker threads, call back on the Tk main thread
+
+    Tasks are submitted in named groups. Cancelling a group drops its
+    queued tasks and discards results of any still running, so callbacks
+    are never called with stale data. Exceptions of tasks and callbacks
+    are reported with the widget's report_callback_exception.
+    """
+
+    def __init__(self, widget, workers=2, interval=40):
+
+        """Initialise with Tk widget used for after() polling"""
+
+        self.widget = widget
+        self.interval = interval
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._results = queue.Queue()
+        self._generation = {}
+        self._futures = {}
+        self._polling = False
+
+    def submit(self, group, func, args=(), callback=None, errback=None):
+
+        """Run func(*args) in background, then callback(result) in Tk
+
+        If func raises, errback(exc_info) is called instead, after the
+        exception was reported.
+        """
+
+        gen = self._generation.get(group, 0)
+        future = self.executor.submit(self._run, group, gen, func, args,
+                                      (callback, errback))
+        self._futures.setdefault(group, []).append(future)
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.interval, self._poll)
+        return future
+
+    def cancel(self, group):
+
+        """Cancel queued tasks in group and discard running ones"""
+
+        self._generation[group] = self._generation.get(group, 0) + 1
+        for future in self._futures.pop(group, []):
+            future.cancel()
+
+    def is_current(self, group, gen):
+
+        """Return True if gen is the current generation of group"""
+
+        return self._generation.get(group, 0) == gen
+
+    def pending(self, group=None):
+
+        """Return number of unfinished tasks (in group, or in total)"""
+
+        groups = [group] if group is not None else list(self._futures)
+        return sum(not f.done() for g in groups
+                   for f in self._futures.get(g, []))
+
+    def shutdown(self):
+
+        """Cancel everything and stop worker threads"""
+
+        for group in list(self._futures):
+            self.cancel(group)
+        self.executor.shutdown(wait=False)
+
+    def _run(self, group, gen, func, args, callbacks):
+
+        """Worker-thread wrapper: run func, queue result"""
+
+        if not self.is_current(group, gen):
+            return
+        try:
+            result, error = func(*args), None
+        except Exception:
+            result, error = None, sys.exc_info()
+        self._results.put((group, gen, callbacks, result, error))
+
+    def _poll(self):
+
+        """Main-thread loop: deliver finished results to callbacks"""
+
+        try:
+            while True:
+                try:
+                    group, gen, (callback, errback), result, error = \
+                        self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if not self.is_current(group, gen):
+                    continue
+                # (a failing callback must not stop later deliveries)
+                try:
+                    if error is not None:
+                        self.widget.report_callback_exception(*error)
+                        if errback is not None:
+                            errback(error)
+                    elif callback is not None:
+                        callback(result)
+                except Exception:
+                    self.widget.report_callback_exception(*sys.exc_info())
+        finally:
+            # forget finished tasks, keep polling while any remain
+            for group, futures in list(self._futures.items()):
+                futures[:] = [f for f in futures if not f.done()]
+                if not futures:
+                    del self._futures[group]
+            if self._futures or not self._results.empty():
+                self.widget.after(self.interval, self._poll)
+            else:
+                self._polling = False
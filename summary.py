@@ -0,0 +1,151 @@
+"""
+Multi-resolution summary tables of continuous logs:
+
+build_summaries (func) - Write the summary tables of log tables to a db.
+summary_table (func)   - Name of the summary table of a table at a bin size.
+resolution (func)      - Bin size to show a depth span at.
+envelope (func)        - Min/max rows of a summary, shaped as the raw table.
+
+Usage:
+    python summary.py --db ./sqlite/example2.db
+
+For each table of SUMMARY_COLUMNS and bin size of BIN_SIZES (m), table
+lod_<table>_<size>m holds one row per hole and depth bin: the bin top as
+depth, and the min, max, mean and count of each column over the bin. The
+finest level is grouped from the raw rows, each coarser level from the
+level before it.
+"""
+
+from __future__ import print_function, division
+import argparse
+import sqlite3
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from logtable import LogTable
+
+# summarised tables (point data in 'depth'): columns
+SUMMARY_COLUMNS = {
+    'tbl_mods': ('young_average', 'young_variability', 'poisson_average',
+                 'poisson_variability'),
+    'tbl_pspr': ('resistance',),
+}
+
+# bin sizes (m), each a multiple of the one before
+BIN_SIZES = (1, 4, 16, 64)
+
+STATS = ('min', 'max', 'mean', 'count')
+
+
+def summary_table(table, size):
+
+    """Return name of the summary table of table at bin size (m)"""
+
+    return 'lod_{}_{}m'.format(table, size)
+
+
+def _bin_top(column, size):
+
+    """Return SQL of the top of the size m bin holding column"""
+
+    # (floor, as CAST truncates towards 0)
+    q = '"{}" / {:f}'.format(column, size)
+    return '(CAST({0} AS INTEGER) - ({0} < CAST({0} AS INTEGER))) * {1}' \
+        .format(q, size)
+
+
+def build_summaries(conn, tables=None):
+
+    """(Re)write summary tables of tables (default: all) on connection conn
+
+    Each table's levels are replaced in one transaction; tables missing
+    from the db are skipped.
+    """
+
+    existing = set(t for t, in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table';"))
+    if tables is None:
+        tables = sorted(SUMMARY_COLUMNS)
+    for table in tables:
+        if table not in existing:
+            continue
+        columns = SUMMARY_COLUMNS[table]
+        defs = ', '.join('"{}_{}" {}'.format(c, s, 'INTEGER' if s == 'count'
+                                             else 'REAL')
+                         for c in columns for s in STATS)
+        source = None
+        with conn:
+            for size in BIN_SIZES:
+                name = summary_table(table, size)
+                conn.execute('DROP TABLE IF EXISTS "{}";'.format(name))
+                conn.execute('CREATE TABLE "{}" (hole_id TEXT, depth REAL, '
+                             '{}, PRIMARY KEY (hole_id, depth)) WITHOUT '
+                             'ROWID;'.format(name, defs))
+                if source is None:
+                    aggs = ['MIN("{0}")', 'MAX("{0}")', 'AVG("{0}")',
+                            'COUNT("{0}")']
+                    source = table
+                    where = 'WHERE hole_id IS NOT NULL AND depth IS NOT NULL'
+                else:
+                    # (mean of a coarser bin weighted by the finer counts)
+                    aggs = ['MIN("{0}_min")', 'MAX("{0}_max")',
+                            'SUM("{0}_mean" * "{0}_count") / '
+                            'SUM("{0}_count")', 'SUM("{0}_count")']
+                    where = ''
+                conn.execute(
+                    'INSERT INTO "{}" SELECT hole_id, {} AS bin, {} FROM "{}" '
+                    '{} GROUP BY hole_id, bin;'.format(
+                        name, _bin_top('depth', size),
+                        ', '.join(a.format(c) for c in columns
+                                  for a in aggs), source, where))
+                source = name
+
+
+def resolution(sizes, span, bins=1000):
+
+    """Return largest of sizes with at least bins bins over span, or None"""
+
+    best = None
+    for size in sorted(sizes):
+        if span / size >= bins:
+            best = size
+    return best
+
+
+def envelope(summary, size):
+
+    """Return LogTable of the min/max rows of a summary LogTable
+
+    Each bin gives two rows in the columns of the raw table: its minima a
+    quarter and its maxima three quarters down the bin, so a curve plots
+    as the envelope of the raw samples. Empty bins are NaN.
+    """
+
+    top = summary.array('depth')
+    depth = np.column_stack([top + size / 4., top + 3 * size / 4.])
+    arrays = OrderedDict([('depth', depth.ravel().astype(top.dtype))])
+    for name in summary.columns:
+        if name.endswith('_min'):
+            column = name[:-len('_min')]
+            arrays[column] = np.column_stack([
+                summary.array(name), summary.array(column + '_max')]).ravel()
+    return LogTable(arrays)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Write summary tables')
+    parser.add_argument('--db', default='./sqlite/example2.db')
+    parser.add_argument('tables', nargs='*',
+                        help='tables to summarise (default: all)')
+    args = parser.parse_args()
+
+    t0 = time.time()
+    conn = sqlite3.connect(args.db)
+    try:
+        build_summaries(conn, args.tables or None)
+    finally:
+        conn.close()
+    print('summaries in {:.1f} s'.format(time.time() - t0))
@@ -0,0 +1,145 @@
+"""
+Synthetic borehole database, for benchmarks:
+
+make_db (func)      - Write a reproducible sqlite database of boreholes.
+hole_tables (func)  - Generate the tables of one borehole.
+
+Usage:
+    python synthetic_db.py bench.db --holes 20 --depth 1000 --density 10
+
+The tables have the schemas the log panels read (see SCHEMA). Values come
+from a seeded generator, so the same arguments give the same database.
+"""
+
+from __future__ import print_function, division
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+# table: columns (after hole_id), in db order
+SCHEMA = [
+    ('tbl_duct', ()),
+    ('tbl_elev', ('chainage', 'elevation')),
+    ('tbl_lith', ('lithology_from', 'lithology_to', 'lithology')),
+    ('tbl_mods', ('depth', 'young_average', 'young_variability',
+                  'poisson_average', 'poisson_variability')),
+    ('tbl_pspr', ('depth', 'resistance')),
+    ('tbl_htus', ('secup', 'trans', 'flag')),
+    ('tbl_pfls', ('pfl_depth', 'trans')),
+    ('tbl_dips', ('depth', 'dip', 'azimuth', 'mineralogy', 'wcf_match')),
+]
+
+TYPES = {'lithology': 'TEXT', 'flag': 'INTEGER', 'wcf_match': 'INTEGER',
+         'mineralogy': 'INTEGER'}
+
+LITHOLOGIES = ['VGN', 'DGN', 'MGN', 'TGG', 'PGR', 'SGN', 'MFGN', 'QGN', 'DB',
+               'KFP', 'UNKNOWN']
+
+
+def hole_tables(rng, depth, density=10., fractures=1.):
+
+    """Return {table: [column arrays]} of a hole of given depth (m)
+
+    density is samples per metre of the continuous logs (moduli and
+    resistance), fractures the mean number of fractures per metre.
+    """
+
+    tables = {'tbl_duct': []}
+
+    # elevation every 10 m, slightly inclined
+    chainage = np.arange(0., depth + 10., 10.)
+    tables['tbl_elev'] = [chainage, 5. - chainage * rng.uniform(.85, 1.)]
+
+    # lithology intervals, mean length 5 m
+    bounds = np.cumsum(rng.exponential(5., int(depth / 2.5) + 10))
+    bounds = np.concatenate([[0.], bounds[bounds < depth], [depth]])
+    tables['tbl_lith'] = [bounds[:-1], bounds[1:],
+                          rng.choice(LITHOLOGIES, len(bounds) - 1)]
+
+    # continuous logs: moduli and resistance, with spikes
+    n = int(depth * density)
+    d = np.linspace(0., depth, n)
+    trend = np.cumsum(rng.normal(0., .05, n))
+    spikes = np.where(rng.uniform(size=n) < .002, rng.normal(0., 20., n), 0.)
+    tables['tbl_mods'] = [d, 60. + trend + spikes + rng.normal(0., 2., n),
+                          np.abs(rng.normal(0., 3., n)),
+                          .25 + trend / 100. + rng.normal(0., .02, n),
+                          np.abs(rng.normal(0., .03, n))]
+    tables['tbl_pspr'] = [d, 10 ** (3. + trend / 10. + rng.normal(0., .3, n))]
+
+    # hydraulic tests every 5 m, flow anomalies about every 20 m
+    secup = np.arange(0., depth, 5.)
+    tables['tbl_htus'] = [secup, 10 ** rng.uniform(-10., -5., len(secup)),
+                          rng.randint(0, 2, len(secup))]
+    m = max(1, int(depth / 20.))
+    tables['tbl_pfls'] = [np.sort(rng.uniform(0., depth, m)),
+                          10 ** rng.uniform(-10., -4., m)]
+
+    # fractures, some with unknown dip
+    m = int(depth * fractures)
+    dip = rng.uniform(0., 90., m)
+    dip[rng.uniform(size=m) < .05] = np.nan
+    tables['tbl_dips'] = [np.sort(rng.uniform(0., depth, m)), dip,
+                          rng.uniform(0., 360., m), rng.randint(0, 9, m),
+                          rng.randint(0, 2, m)]
+    return tables
+
+
+def make_db(path, holes=10, depth=1000., density=10., fractures=1., seed=0):
+
+    """Write synthetic db to path (replacing it), return number of rows"""
+
+    if os.path.exists(path):
+        os.remove(path)
+    rng = np.random.RandomState(seed)
+    conn = sqlite3.connect(path)
+    rows = 0
+    try:
+        for table, cols in SCHEMA:
+            defs = ['hole_id TEXT'] + [
+                '"{}" {}'.format(c, TYPES.get(c, 'REAL')) for c in cols]
+            conn.execute('CREATE TABLE "{}" ({});'.format(table,
+                                                         ', '.join(defs)))
+        for i in range(holes):
+            bh = 'SYN{:03d}'.format(i + 1)
+            # vary hole depth a little
+            tables = hole_tables(rng, depth * rng.uniform(.8, 1.), density,
+                                 fractures)
+            for table, cols in SCHEMA:
+                arrays = tables[table]
+                if not cols:
+                    conn.execute('INSERT INTO "{}" VALUES (?);'.format(table),
+                                 (bh,))
+                    continue
+                values = zip(*[[bh] * len(arrays[0])] +
+                             [a.tolist() for a in arrays])
+                conn.executemany('INSERT INTO "{}" VALUES ({});'.format(
+                    table, ', '.join('?' * (len(cols) + 1))), values)
+                rows += len(arrays[0])
+        conn.commit()
+    finally:
+        conn.close()
+    return rows
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Write synthetic log db')
+    parser.add_argument('path', help='sqlite file to (over)write')
+    parser.add_argument('--holes', type=int, default=10)
+    parser.add_argument('--depth', type=float, default=1000.,
+                        help='hole depth, m')
+    parser.add_argument('--density', type=float, default=10.,
+                        help='continuous log samples per m')
+    parser.add_argument('--fractures', type=float, default=1.,
+                        help='fractures per m')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.time()
+    n = make_db(args.path, args.holes, args.depth, args.density,
+                args.fractures, args.seed)
+    print('{} rows in {:.1f} s'.format(n, time.time() - t0))
@@ -0,0 +1,198 @@
+"""
+Tests of log panels:
+
+PanelAxesTest (class)   - Each panel draws into axes of its own.
+HostReuseTest (class)   - Shared-figure artists and memory stay flat over
+                          hole switches.
+CanvasReuseTest (class) - The same for panels with a canvas each (needs a
+                          display).
+
+Run with: python -m unittest test_panels
+"""
+
+from __future__ import division
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+try:
+    import Tkinter as tk
+except ImportError:
+    import tkinter as tk
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from batch_export import export_hole
+from logplotter_sql import dbConnect
+from panels import LogFigure, data_columns, log_panels
+from synthetic_db import make_db
+
+
+def rss():
+
+    """Return resident set size of this process (bytes)"""
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError):
+        # (peak, not current, size: still flat if nothing leaks)
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def tk_root():
+
+    """Return a withdrawn Tk root, or skip the test without a display"""
+
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        raise unittest.SkipTest('no display for Tk canvases')
+    root.withdraw()
+    return root
+
+
+def shared_figure():
+
+    """Return headless LogFigure of the standard panels"""
+
+    host = LogFigure(figsize=(7, 4), canvas_class=FigureCanvasAgg)
+    log_panels(None, host=host)
+    host.layout()
+    return host
+
+
+class DbTestCase(unittest.TestCase):
+
+    """Test case with a small synthetic db"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.dbpath = os.path.join(cls.tmp, 'test.db')
+        make_db(cls.dbpath, holes=4, depth=150., density=5., fractures=.2,
+                seed=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        dbConnect(cls.dbpath).close()
+        shutil.rmtree(cls.tmp)
+
+    def read_holes(self, panels):
+
+        """Return [{table: LogTable}] of all holes, as the panels read"""
+
+        db = dbConnect(self.dbpath)
+        holes = [bh for bh, in db.connection().execute(dbConnect.qry_bhs)]
+        return [dict((t, db.fetch_table(t, bh, columns=cols))
+                     for t, cols in data_columns(panels).items())
+                for bh in holes]
+
+
+class PanelAxesTest(DbTestCase):
+
+    """Each panel has header and log axes of its own"""
+
+    def assertDistinct(self, panels):
+        for name in ('ax_hdr', 'ax_log'):
+            self.assertEqual(len(set(getattr(p, name) for p in panels)),
+                             len(panels), name)
+
+    def test_shared_figure(self):
+        host = shared_figure()
+        self.assertDistinct(host.panels)
+        host.check_columns()
+
+    def test_canvases(self):
+        root = tk_root()
+        try:
+            panels = log_panels(root)
+            self.assertDistinct(panels)
+            self.assertEqual(len(set(p.fig for p in panels)), len(panels))
+        finally:
+            root.destroy()
+
+    def test_export(self):
+        # (export_hole checks its figure's columns)
+        outdir = os.path.join(self.tmp, 'export')
+        os.mkdir(outdir)
+        _, rec = export_hole(self.dbpath, 'SYN001', outdir)
+        self.assertEqual(len(rec['files']), rec['pages'])
+        self.assertTrue(all(os.path.exists(f) for f in rec['files']))
+
+
+class HostReuseTest(DbTestCase):
+
+    """Replotting boreholes reuses panel artists instead of adding more"""
+
+    switches = 100
+
+    def setUp(self):
+        self.host = shared_figure()
+        self.panels = self.host.panels
+        self.holes = self.read_holes(self.panels)
+
+    def figures(self):
+        return [self.host.fig]
+
+    def artists(self):
+        return sum(len(ax.get_children()) for fig in self.figures()
+                   for ax in fig.axes)
+
+    def render(self):
+        # (draw_idle renders at once on an Agg canvas)
+        self.host.set_depthlims(0, 100)
+
+    def switch(self, i):
+
+        """Show hole i (of the test holes, cycling), render every tenth"""
+
+        data = self.holes[i % len(self.holes)]
+        for panel in self.panels:
+            panel.plot(*[data[t] for t in panel.tables])
+        if not i % 10:
+            self.render()
+
+    def test_flat_over_switches(self):
+        # (first round of holes allocates the artists and caches)
+        for i in range(10, 10 + 2 * len(self.holes)):
+            self.switch(i)
+        gc.collect()
+        artists, memory = self.artists(), rss()
+
+        for i in range(self.switches):
+            self.switch(i)
+        gc.collect()
+        self.assertEqual(self.artists(), artists)
+        # (allocator noise, far below one leaked figure per switch)
+        self.assertLess(rss() - memory, 8 * 2**20)
+
+
+class CanvasReuseTest(HostReuseTest):
+
+    """HostReuseTest for panels with a Tk canvas each"""
+
+    def setUp(self):
+        self.root = tk_root()
+        self.panels = log_panels(self.root)
+        self.holes = self.read_holes(self.panels)
+
+    def tearDown(self):
+        self.root.destroy()
+
+    def figures(self):
+        return [p.fig for p in self.panels]
+
+    def render(self):
+        for panel in self.panels:
+            panel.set_depthlims(0, 100)
+            panel.draw()
+        self.root.update_idletasks()
+
+
+if __name__ == '__main__':
+    unittest.main()
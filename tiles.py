@@ -0,0 +1,57 @@
+"""
+Rendered page tiles:
+
+TileCache (class)       - Byte-budget LRU of rendered canvas pages.
+render_offscreen (func) - Render canvas at given depth limits, Agg only.
+"""
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from cache import MemoryLRU
+
+
+class TileCache(MemoryLRU):
+
+    """LRU of (region, nbytes) tiles from canvas.copy_from_bbox
+
+    Keys are (bh, view, page, size, facecolor) tuples, where view
+    identifies the canvas (panel index, or 'shared').
+    """
+
+    def __init__(self, budget=64 * 2**20):
+
+        """Initialise, default budget 64 MiB"""
+
+        super(TileCache, self).__init__(budget, lambda tile: tile[1])
+
+    @staticmethod
+    def capture(canvas):
+
+        """Return (region, nbytes) tile of the whole canvas"""
+
+        width, height = canvas.get_width_height()
+        return canvas.copy_from_bbox(canvas.figure.bbox), width * height * 4
+
+    def invalidate(self, bh=None, view=None):
+
+        """Drop tiles of borehole bh and/or view (all tiles if neither)"""
+
+        for key in list(self._items):
+            if bh is not None and key[0] != bh:
+                continue
+            if view is not None and key[1] != view:
+                continue
+            self.discard(key)
+
+
+def render_offscreen(canvas, ax, ymin, ymax):
+
+    """Render canvas with depth limits (ymin, ymax) into its Agg buffer
+
+    The screen is not updated; the previous depth limits are restored.
+    """
+
+    lims = ax.get_ylim()
+    ax.set_ylim(ymax, ymin)
+    FigureCanvasAgg.draw(canvas)
+    ax.set_ylim(lims)